@@ -0,0 +1,207 @@
+"""Headless frame export for trailers and visual regression tests.
+
+`python cozy_game.py --export-frames DIR` renders the game at a fixed dt
+under SDL's dummy video driver and hands every frame to FrameExporter.
+Frames are copied once from the game surface into a ring of shared-memory
+slots; pool workers read their slot through a zero-copy memoryview, encode
+it to PNG and optionally compare it with the same frame in a reference
+directory.
+
+Input scripts are plain text, one action per line:
+
+    # frame action args
+    0   down right
+    45  up right
+    60  down space
+    61  up space
+    90  click 150 100
+"""
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pygame
+
+PERCEPTUAL_JND = 6.0  # luminance steps (0-255) below which a change is invisible
+DIFF_TOLERANCE = 0.001  # fraction of pixels allowed over JND before a frame fails
+
+
+def _rgbx_masks():
+    # masks that lay pixels out in memory as R, G, B, X bytes
+    if sys.byteorder == 'little':
+        return (0xff, 0xff00, 0xff0000, 0)
+    return (0xff000000, 0xff0000, 0xff00, 0)
+
+
+class InputScript:
+    """Keyboard and mouse input replayed frame by frame instead of read from SDL."""
+
+    def __init__(self, actions):
+        self._by_frame = {}
+        for frame, action in actions:
+            self._by_frame.setdefault(frame, []).append(action)
+        self._held = set()
+
+    @classmethod
+    def load(cls, path):
+        actions = []
+        with open(path) as f:
+            for lineno, line in enumerate(f, 1):
+                parts = line.split('#', 1)[0].split()
+                if not parts:
+                    continue
+                try:
+                    frame, kind = int(parts[0]), parts[1]
+                    if kind in ('down', 'up'):
+                        actions.append((frame, (kind, pygame.key.key_code(parts[2]))))
+                    elif kind == 'click':
+                        actions.append((frame, (kind, (int(parts[2]), int(parts[3])))))
+                    else:
+                        raise ValueError(f'unknown action {kind!r}')
+                except (IndexError, ValueError) as e:
+                    raise ValueError(f'{path}:{lineno}: {e}') from None
+        return cls(actions)
+
+    def events(self, frame):
+        """Return the pygame events scripted for this frame, updating held keys."""
+        events = []
+        for kind, arg in self._by_frame.get(frame, ()):
+            if kind == 'down':
+                self._held.add(arg)
+                # single-character keys type themselves, as they would from SDL
+                name = pygame.key.name(arg)
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=arg,
+                                                 unicode=name if len(name) == 1 else ''))
+            elif kind == 'up':
+                self._held.discard(arg)
+                events.append(pygame.event.Event(pygame.KEYUP, key=arg))
+            else:
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=arg))
+        return events
+
+    def __getitem__(self, key):
+        # stands in for pygame.key.get_pressed()
+        return key in self._held
+
+
+def perceptual_diff(a, b):
+    """Compare two surfaces the way a viewer would.
+
+    Both are reduced to luminance and box-filtered 2x2 so single-pixel
+    anti-aliasing noise is ignored. Returns (mean difference in 0-255
+    luminance steps, fraction of pixels differing by more than PERCEPTUAL_JND).
+    """
+    if a.get_size() != b.get_size():
+        return 255.0, 1.0
+    d = np.abs(_luma(a) - _luma(b))
+    return float(d.mean()), float((d > PERCEPTUAL_JND).mean())
+
+
+def _luma(surf):
+    rgb = pygame.surfarray.array3d(surf).astype(np.float32)
+    y = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    w, h = y.shape[0] // 2 * 2, y.shape[1] // 2 * 2
+    return y[:w, :h].reshape(w // 2, 2, h // 2, 2).mean(axis=(1, 3))
+
+
+_worker_shm = None
+
+
+def _worker_init(shm_name):
+    global _worker_shm
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    _worker_shm = shared_memory.SharedMemory(shm_name)
+
+
+def _encode_frame(offset, size, path, ref_path):
+    view = _worker_shm.buf[offset:offset + size[0] * size[1] * 4]
+    try:
+        surf = pygame.image.frombuffer(view, size, 'RGBX')
+        pygame.image.save(surf, path)
+        diff = None
+        if ref_path is not None:
+            if os.path.exists(ref_path):
+                diff = perceptual_diff(surf, pygame.image.load(ref_path))
+            else:
+                diff = (255.0, 1.0)
+        del surf
+    finally:
+        view.release()
+    return os.path.basename(path), diff
+
+
+class FrameExporter:
+    """Encode rendered frames to DIR/frame_NNNNN.png on a process pool."""
+
+    def __init__(self, out_dir, size, reference_dir=None, workers=None,
+                 tolerance=DIFF_TOLERANCE):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.size = size
+        self.reference_dir = reference_dir
+        self.tolerance = tolerance
+        self.frame_bytes = size[0] * size[1] * 4
+        workers = workers or os.cpu_count() or 1
+        # two slots per worker keeps every worker busy while the game renders
+        self._slots = [None] * (workers * 2)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self.frame_bytes * len(self._slots))
+        self._pool = ProcessPoolExecutor(
+            workers, initializer=_worker_init, initargs=(self._shm.name,))
+        self.frames = 0
+        self.diffs = []
+
+    @staticmethod
+    def make_surface(size):
+        """Return a render target whose raw pixels the workers can read as RGBX."""
+        return pygame.Surface(size, 0, 32, masks=_rgbx_masks())
+
+    def submit(self, surf):
+        slot = self.frames % len(self._slots)
+        if self._slots[slot] is not None:
+            self._collect(self._slots[slot])
+        offset = slot * self.frame_bytes
+        self._shm.buf[offset:offset + self.frame_bytes] = surf.get_view('0')
+        name = f'frame_{self.frames:05d}.png'
+        ref_path = None
+        if self.reference_dir:
+            ref_path = os.path.join(self.reference_dir, name)
+        self._slots[slot] = self._pool.submit(
+            _encode_frame, offset, self.size, os.path.join(self.out_dir, name), ref_path)
+        self.frames += 1
+
+    def _collect(self, future):
+        name, diff = future.result()
+        if diff is not None:
+            self.diffs.append((name, *diff))
+
+    def close(self):
+        """Wait for outstanding frames; return the number of frames failing the diff.
+
+        The pool and shared memory are released even if a frame failed to encode.
+        """
+        try:
+            for future in self._slots:
+                if future is not None:
+                    self._collect(future)
+        finally:
+            self._slots = []
+            try:
+                self._pool.shutdown(cancel_futures=True)
+            finally:
+                self._shm.close()
+                self._shm.unlink()
+        if not self.reference_dir:
+            return 0
+        self.diffs.sort()
+        failed = [d for d in self.diffs if d[2] > self.tolerance]
+        with open(os.path.join(self.out_dir, 'diff.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'mean_luma_diff', 'changed_fraction', 'ok'])
+            for name, mean, changed in self.diffs:
+                writer.writerow([name, f'{mean:.3f}', f'{changed:.5f}',
+                                 int(changed <= self.tolerance)])
+        return len(failed)
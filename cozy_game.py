@@ -1,13 +1,31 @@
+import argparse
+import collections
 import math
+import os
 import random
+import select
+import socket
 import sys
 import datetime
+import functools
+import numpy as np
 import pygame
 
+import cozy_shop
+import cozy_telemetry
+from cozy_render import BACKENDS, open_backend
+from cozy_rewind import REWIND_SECONDS, RewindBuffer
+from cozy_world import Camera, ChunkCache, NavGrid, SpatialGrid
+
 # Cozy Game - minimal Pygame prototype
 # Controls: Arrow keys or WASD to move, Space to sit/stand
 
 WIDTH, HEIGHT = 800, 600
+WORLD_W, WORLD_H = 4000, 3000  # the village around the cozy corner
+HOME_RECT = pygame.Rect(0, 0, WIDTH, HEIGHT)  # the cozy corner, top-left of the world
+WORLD_RECT = pygame.Rect(0, 0, WORLD_W, WORLD_H)
+VILLAGE_TREES = 400
+VILLAGE_LOT = 300  # houses are placed on a grid of lots this many px apart
 BG_COLOR = (222, 206, 176)  # warm beige
 COZY_DECAY = 0.5  # coziness points lost per second
 COZY_SIT_GAIN = 6.0  # coziness points gained per second while sitting near fire
@@ -22,12 +40,70 @@ WINDCHIME_POS = (50, 100)  # top-left windchime
 BOOKSHELF_POS = (WIDTH - 50, 100)  # top-right bookshelf
 FIREPLACE_SITSPOT_RADIUS = 100  # radius around fire for sitting bonus
 HIGH_COZY_THRESHOLD = 90  # coziness level that triggers celebration
+FRUIT_REGROW_RATE = 0.12  # chance per second a picked fruit grows back (~8 s on average)
+REWIND_SPEED = 2  # history ticks stepped back per frame while R is held
+# tunables that shop items may change (see shop_catalog.json); each CozySim
+# starts from these module values and keeps its own copy
+SHOP_TUNABLES = ('COZY_DECAY', 'COZY_SIT_GAIN', 'TEA_SPAWN_RATE', 'SPAWN_EFFECT_LIFE',
+                 'CAT_COZY_GAIN', 'RUG_COZY_GAIN')
+SHOP_RECT = pygame.Rect(WIDTH // 2 - 210, HEIGHT // 2 - 170, 420, 340)
+SHOP_LIST_RECT = pygame.Rect(SHOP_RECT.x + 20, SHOP_RECT.y + 34, SHOP_RECT.w - 56,
+                             7 * cozy_shop.ROW_HEIGHT)  # seven rows visible
+# lights: (radius, additive colour at full intensity)
+LANTERN_LIGHT = (110, (120, 100, 60))
+FIRE_LIGHT = (190, (170, 105, 40))
+LAMP_LIGHT = (120, (120, 95, 50))
+LIGHT_LEVELS = 32  # flicker intensities are quantised to this many cached stamps
+# detail levels, best first; the quality governor steps down this list when
+# frames run over budget and back up when there is headroom again
+DETAIL_LEVELS = [
+    {'name': 'full', 'fire_layers': (0, 1, 2, 3, 4), 'rug_fringe': True,
+     'glows': True, 'lighting': True, 'highlights': True, 'smooth_scale': True},
+    {'name': 'high', 'fire_layers': (0, 1, 2, 3, 4), 'rug_fringe': True,
+     'glows': True, 'lighting': True, 'highlights': True, 'smooth_scale': False},
+    {'name': 'medium', 'fire_layers': (0, 2, 4), 'rug_fringe': False,
+     'glows': True, 'lighting': True, 'highlights': True, 'smooth_scale': False},
+    {'name': 'low', 'fire_layers': (0, 2, 4), 'rug_fringe': False,
+     'glows': False, 'lighting': True, 'highlights': False, 'smooth_scale': False},
+    {'name': 'minimal', 'fire_layers': (0, 4), 'rug_fringe': False,
+     'glows': False, 'lighting': False, 'highlights': False, 'smooth_scale': False},
+]
+DETAIL = DETAIL_LEVELS[0]  # current settings, read by the draw functions
+FRAME_BUDGET_MS = 1000 / 60
+# ambient light through the day: (hour, rgb), interpolated linearly
+AMBIENT_BY_HOUR = [
+    (0.0, (110, 115, 160)),
+    (6.0, (150, 140, 165)),
+    (8.0, (235, 225, 215)),
+    (17.0, (240, 235, 225)),
+    (19.5, (200, 160, 140)),
+    (22.0, (110, 115, 160)),
+    (24.0, (110, 115, 160)),
+]
+FIRE_POS = (140, HEIGHT - 160)  # fireplace base centre
+FIRE_RECT = pygame.Rect(FIRE_POS[0] - 60, FIRE_POS[1] - 90, 120, 120)  # flames and log
+BOOKSHELF_RECT = pygame.Rect(BOOKSHELF_POS[0] - 20, BOOKSHELF_POS[1] - 30, 40, 60)
+CAT_CLEARANCE = 24  # obstacles are grown by this much so cats' bodies fit past
+CAT_FIRE_REACH = 60  # cats closer than this to the fire walk away from it
+FIRE_NAV_RECT = FIRE_RECT.inflate(CAT_CLEARANCE, CAT_CLEARANCE)  # blocked for cats
+TREAT_SNAP = 48  # px; cats called with a treat head for this grid's nearest point
+RUG_RECT = pygame.Rect(WIDTH - 260, HEIGHT - 220, 200, 120)  # rug (right side)
+# trees for scenery: (x, y, size)
+TREES = [
+    (80, 120, 1.2),      # left side tree, large
+    (150, 160, 0.9),     # left side tree, medium
+    (WIDTH - 120, 140, 1.1),  # right side tree, large
+    (WIDTH - 200, 180, 0.8),  # right side tree, small
+    (WIDTH // 2 - 100, 130, 1.0),  # center-left tree
+    (WIDTH // 2 + 80, 150, 0.95),  # center-right tree
+]
 
 
 class Player:
-    def __init__(self, x, y):
+    def __init__(self, x, y, bounds=WORLD_RECT):
         self.x = x
         self.y = y
+        self.bounds = bounds
         self.r = 18
         self.color = (60, 40, 20)
         self.speed = 4
@@ -37,12 +113,19 @@ class Player:
         self.walk_phase = 0  # 0 or 1
         self.walk_timer = 0.0
         self.walk_step_time = 0.22  # seconds per phase
+        # cozy stats, kept up to date by CozySim
+        self.coziness = 10.0
+        self.teas_collected = 0
+        self.books_read = 0
+        self.book_cooldown = 0.0
+        self.high_cozy = False  # reached HIGH_COZY_THRESHOLD at least once
 
     def move(self, dx, dy):
         if self.sitting:
             return
-        self.x = max(self.r, min(WIDTH - self.r, self.x + dx))
-        self.y = max(self.r, min(HEIGHT - self.r, self.y + dy))
+        b = self.bounds
+        self.x = max(b.left + self.r, min(b.right - self.r, self.x + dx))
+        self.y = max(b.top + self.r, min(b.bottom - self.r, self.y + dy))
         # walking flag for animation
         self.walking = (dx != 0 or dy != 0)
         if not self.walking:
@@ -66,10 +149,10 @@ class Player:
             self.walk_timer = 0.0
             self.walk_phase = 0
 
-    def draw(self, surf):
+    def draw(self, surf, offset=(0, 0)):
         # Draw a stickman-style player with simple clothing
-        cx = int(self.x)
-        cy = int(self.y)
+        cx = int(self.x) - offset[0]
+        cy = int(self.y) - offset[1]
 
         head_r = 8
         torso_h = 28
@@ -116,9 +199,8 @@ class Player:
             # pants block
             pygame.draw.rect(surf, pants_color, (cx - 9, cy + 8, 18, 10))
             # small zzz indicator above head
-            font = pygame.font.SysFont(None, 14)
-            img = font.render('z z', True, (100, 100, 100))
-            surf.blit(img, (cx - 8, head_center[1] - head_r - 14))
+            surf.blit(text_sprite('z z', 14, (100, 100, 100)),
+                      (cx - 8, head_center[1] - head_r - 14))
         else:
             # standing stickman
             # head
@@ -156,9 +238,10 @@ class Player:
 
 
 class Tea:
-    def __init__(self):
-        self.x = random.randint(40, WIDTH - 40)
-        self.y = random.randint(120, HEIGHT - 80)
+    def __init__(self, area=HOME_RECT):
+        # spawn inside area, away from its edges and the top UI strip
+        self.x = random.randint(area.left + 40, area.right - 40)
+        self.y = random.randint(area.top + 120, area.bottom - 80)
         # collision radius (used in main loop)
         self.r = 12
 
@@ -169,8 +252,8 @@ class Tea:
         self.cup_color = (245, 240, 230)  # ceramic white
         self.tea_color = (180, 120, 80)   # warm tea brown
 
-    def draw(self, surf):
-        cx, cy = self.x, self.y
+    def draw(self, surf, offset=(0, 0)):
+        cx, cy = self.x - offset[0], self.y - offset[1]
 
         # cup body (rounded rectangle)
         cup_rect = pygame.Rect(cx - self.w//2, cy - self.h//2, self.w, self.h)
@@ -213,15 +296,26 @@ class Fruit:
         self.fruit_type = random.choice(list(self.COLORS.keys()))
         self.color = self.COLORS[self.fruit_type]
         self.collected = False
+        self._rewind = None
+
+    def rewind_fields(self):
+        # fruits hardly ever change, so hand back the same dict until one does
+        fields = self._rewind
+        if fields is None or fields['c'] != self.collected:
+            fields = self._rewind = {'x': self.x, 'y': self.y, 'k': self.fruit_type,
+                                     'c': self.collected}
+        return fields
 
-    def draw(self, surf):
+    def draw(self, surf, offset=(0, 0)):
         if not self.collected:
+            x, y = self.x - offset[0], self.y - offset[1]
             pygame.draw.circle(
-                surf, self.color, (int(self.x), int(self.y)), self.r)
+                surf, self.color, (int(x), int(y)), self.r)
             # highlight
-            highlight_r = max(1, self.r - 2)
-            pygame.draw.circle(surf, (255, 255, 255), (int(
-                self.x - self.r // 3), int(self.y - self.r // 3)), highlight_r // 2)
+            if DETAIL['highlights']:
+                highlight_r = max(1, self.r - 2)
+                pygame.draw.circle(surf, (255, 255, 255), (int(
+                    x - self.r // 3), int(y - self.r // 3)), highlight_r // 2)
 
     def get_value(self):
         """Return coziness value and label based on fruit type."""
@@ -247,7 +341,7 @@ class SpawnEffect:
         # float upward slightly
         self.y -= 30 * dt
 
-    def draw(self, surf, font):
+    def draw(self, surf, font, offset=(0, 0)):
         if self.life <= 0:
             return
         a = max(0.0, min(1.0, self.life / self.total))
@@ -256,7 +350,8 @@ class SpawnEffect:
             text_surf.set_alpha(int(255 * a))
         except Exception:
             pass
-        surf.blit(text_surf, (int(self.x) - 12, int(self.y) - 6))
+        surf.blit(text_surf, (int(self.x) - offset[0] - 12,
+                              int(self.y) - offset[1] - 6))
 
 
 class WindChime:
@@ -273,50 +368,87 @@ class WindChime:
         if self.chime_time > 0:
             self.chime_time -= dt
 
-    def draw(self, surf):
+    def draw(self, surf, offset=(0, 0)):
+        x, y = self.x - offset[0], self.y - offset[1]
         # simple wind chime
         pygame.draw.circle(surf, (180, 140, 100),
-                           (int(self.x), int(self.y)), self.r)
+                           (int(x), int(y)), self.r)
         # strings
         for i in range(3):
             off = math.cos(self.chime_time * 8 + i) * \
                 4 if self.chime_time > 0 else 0
-            pygame.draw.line(surf, (100, 80, 60), (self.x, self.y),
-                             (self.x - 8 + i * 8 + off, self.y + 12), 2)
+            pygame.draw.line(surf, (100, 80, 60), (x, y),
+                             (x - 8 + i * 8 + off, y + 12), 2)
         # bells
         for i in range(3):
-            bell_x = self.x - 8 + i * 8
-            bell_y = self.y + 16
+            bell_x = x - 8 + i * 8
+            bell_y = y + 16
             pygame.draw.circle(surf, (200, 160, 100), (bell_x, bell_y), 4)
 
 
 class Cat:
-    def __init__(self, x, y):
+    def __init__(self, x, y, bounds=HOME_RECT):
         self.x = x
         self.y = y
+        self.bounds = bounds
         self.r = 14
         self.color = (90, 60, 40)
         self._dir = random.random() * math.tau
         self._speed = 18  # px/sec
         self._timer = random.uniform(1.0, 3.0)
         self._tail_time = 0  # for tail animation
-
-    def update(self, dt):
+        self.goal = None  # name of the flow field being followed, if any
+
+    def update(self, dt, nav=None, fields=None):
+        """Wander, or follow one of the shared flow fields in `fields`.
+
+        fields maps goal names to NavGrid flow fields: 'treat' (someone is
+        holding one out) wins, then 'flee' (too close to the fire), and
+        every so often a cat wanders over to nap on the 'rug'.
+        """
+        fields = fields or {}
+        if nav is not None:
+            if 'treat' in fields:
+                self.goal = 'treat'
+            elif self.goal == 'treat':
+                self.goal = None
+            if self.goal != 'treat' and nav.direction(fields.get('flee'), self.x, self.y) != (0.0, 0.0):
+                self.goal = 'flee'
         # wander: keep a direction for a bit, occasionally pick new
         self._timer -= dt
         if self._timer <= 0:
             self._dir = random.random() * math.tau
             self._timer = random.uniform(1.0, 3.0)
-        self.x += math.cos(self._dir) * self._speed * dt
-        self.y += math.sin(self._dir) * self._speed * dt
+            if self.goal in (None, 'rug'):
+                self.goal = 'rug' if 'rug' in fields and random.random() < 0.3 else None
+        speed = self._speed
+        if self.goal is not None and nav is not None:
+            dx, dy = nav.direction(fields.get(self.goal), self.x, self.y)
+            if dx or dy:
+                self._dir = math.atan2(dy, dx)
+                speed = self._speed * (1.5 if self.goal == 'rug' else 3)
+            else:
+                # arrived: nap on the rug / sit at the player's feet
+                speed = 0
+                if self.goal == 'flee':
+                    self.goal = None
+        elif (nav is not None and not nav.is_blocked(self.x, self.y)
+              and nav.is_blocked(self.x + math.cos(self._dir) * self.r,
+                                 self.y + math.sin(self._dir) * self.r)):
+            # wandering into the fire or furniture: pick another way
+            self._dir = random.random() * math.tau
+            speed = 0
+        self.x += math.cos(self._dir) * speed * dt
+        self.y += math.sin(self._dir) * speed * dt
         # clamp to play area
-        self.x = max(40, min(WIDTH - 40, self.x))
-        self.y = max(120, min(HEIGHT - 80, self.y))
+        b = self.bounds
+        self.x = max(b.left + 40, min(b.right - 40, self.x))
+        self.y = max(b.top + 120, min(b.bottom - 80, self.y))
         # advance tail animation
         self._tail_time += dt
 
-    def draw(self, surf):
-        cx, cy = int(self.x), int(self.y)
+    def draw(self, surf, offset=(0, 0)):
+        cx, cy = int(self.x) - offset[0], int(self.y) - offset[1]
         # body outline
         pygame.draw.circle(surf, (220, 200, 180), (cx, cy), self.r + 6)
         # body
@@ -349,15 +481,89 @@ class Cat:
         pygame.draw.circle(surf, eye_color, (cx - 5, cy - 2), 2)
         pygame.draw.circle(surf, eye_color, (cx + 5, cy - 2), 2)
         # eye shine
-        pygame.draw.circle(surf, (200, 200, 200), (cx - 4, cy - 3), 1)
-        pygame.draw.circle(surf, (200, 200, 200), (cx + 6, cy - 3), 1)
+        if DETAIL['highlights']:
+            pygame.draw.circle(surf, (200, 200, 200), (cx - 4, cy - 3), 1)
+            pygame.draw.circle(surf, (200, 200, 200), (cx + 6, cy - 3), 1)
+
+
+def set_detail_level(level):
+    """Switch the detail settings used by the draw functions.
+
+    Returns True when static scenery looks different at the new level and
+    cached chunks need redrawing.
+    """
+    global DETAIL
+    old = DETAIL
+    DETAIL = DETAIL_LEVELS[level]
+    return old['rug_fringe'] != DETAIL['rug_fringe']
+
+
+class QualityGovernor:
+    """Choose a detail level from recent frame times.
+
+    Steps down a level when the average of the last `window` frames is over
+    budget, and back up only after a longer stretch comfortably under it.
+    If a restored level immediately runs over budget again, the wait before
+    the next restore doubles, so the level settles instead of oscillating.
+
+    Levels that differ from the one above only in `ignored` settings (ones
+    the render backend can't act on) are skipped, since stepping to them
+    would cost a wait without saving anything.
+    """
+
+    def __init__(self, budget_ms=FRAME_BUDGET_MS, window=30, forced=None, ignored=()):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.forced = forced
+        self.steps = [0]  # the levels the governor moves between, best first
+        for level in range(1, len(DETAIL_LEVELS)):
+            above = DETAIL_LEVELS[self.steps[-1]]
+            if any(value != above[key] for key, value in DETAIL_LEVELS[level].items()
+                   if key != 'name' and key not in ignored):
+                self.steps.append(level)
+        self.level = forced if forced is not None else 0
+        self.samples = collections.deque(maxlen=window)
+        self._restore_window = window * 4
+        self._since_change = 0
+        self._last_change_was_restore = False
+
+    def record(self, frame_ms):
+        """Add one frame's work time; returns the (possibly new) level."""
+        if self.forced is not None:
+            return self.level
+        self.samples.append(frame_ms)
+        self._since_change += 1
+        if len(self.samples) < self.window:
+            return self.level
+        avg = sum(self.samples) / len(self.samples)
+        step = self.steps.index(self.level)
+        if avg > self.budget_ms and step < len(self.steps) - 1:
+            if self._last_change_was_restore and self._since_change < self._restore_window:
+                # the better level didn't hold; be slower to try it again
+                self._restore_window = min(self._restore_window * 2, self.window * 64)
+            self._change(self.steps[step + 1], restore=False)
+        elif (avg < self.budget_ms * 0.6 and step > 0
+              and self._since_change >= self._restore_window):
+            self._change(self.steps[step - 1], restore=True)
+        return self.level
+
+    def _change(self, level, restore):
+        self.level = level
+        self.samples.clear()
+        self._since_change = 0
+        self._last_change_was_restore = restore
+
+
+def fire_phase(t, i):
+    # brightness (0..1) of flame layer i at time t
+    return (math.sin(t * 2.0 + i) + 1) / 2
 
 
 def draw_fire(surf, cx, cy, t):
     # simple animated flame using sin waves
     base_w = 80
-    for i in range(5):
-        a = (math.sin(t * 2.0 + i) + 1) / 2
+    for i in DETAIL['fire_layers']:
+        a = fire_phase(t, i)
         color = (
             int(255 - 80 * (i / 5.0) - a * 30),
             int(120 + 80 * a - i * 6),
@@ -387,20 +593,108 @@ def draw_tree(surf, x, y, size=1.0):
         x - foliage_r // 3), int(y - foliage_r // 3)), foliage_r // 2)
 
 
-def draw_clock(surf):
-    # get current time
-    now = datetime.datetime.now()
-    time_str = now.strftime("%I:%M %p")  # 12-hour format with AM/PM
-
-    # clock background (rounded rectangle)
+@functools.lru_cache(maxsize=None)
+def glow_surface(w, h, rgba):
+    # soft elliptical glow, built once per size/colour
+    glow = pygame.Surface((w, h), pygame.SRCALPHA)
+    pygame.draw.ellipse(glow, rgba, glow.get_rect())
+    return glow
+
+
+def ambient_light(now):
+    """Ambient light colour for the given datetime."""
+    hour = now.hour + now.minute / 60 + now.second / 3600
+    for (h0, c0), (h1, c1) in zip(AMBIENT_BY_HOUR, AMBIENT_BY_HOUR[1:]):
+        if h0 <= hour <= h1:
+            f = (hour - h0) / (h1 - h0)
+            return tuple(int(a + (b - a) * f) for a, b in zip(c0, c1))
+    return AMBIENT_BY_HOUR[-1][1]
+
+
+class LightMap:
+    """Screen-sized light buffer multiplied over the scene once per frame.
+
+    Each frame starts from the ambient colour; every light adds a cached
+    radial-gradient stamp, so a light costs one small additive blit and
+    the full-screen work is a single multiplicative blend however many
+    lights there are.
+    """
+
+    def __init__(self, size):
+        self.surface = pygame.Surface(size)
+        self._stamps = {}
+
+    def _stamp(self, radius, color, level):
+        key = (radius, color, level)
+        stamp = self._stamps.get(key)
+        if stamp is None:
+            c = np.arange(radius * 2) - radius + 0.5
+            d2 = (c[:, None] ** 2 + c[None, :] ** 2) / radius ** 2
+            falloff = np.clip(1.0 - d2, 0.0, 1.0) ** 2 * (level / LIGHT_LEVELS)
+            rgb = falloff[..., None] * np.array(color, dtype=np.float64)
+            stamp = pygame.Surface((radius * 2, radius * 2))
+            pygame.surfarray.blit_array(stamp, rgb.astype(np.uint8))
+            self._stamps[key] = stamp
+        return stamp
+
+    def begin(self, ambient):
+        self.surface.fill(ambient)
+
+    def add(self, x, y, radius, color, intensity=1.0):
+        level = max(0, min(LIGHT_LEVELS, round(intensity * LIGHT_LEVELS)))
+        if level:
+            self.surface.blit(self._stamp(radius, color, level),
+                              (int(x) - radius, int(y) - radius),
+                              special_flags=pygame.BLEND_RGB_ADD)
+
+    def apply(self, backend):
+        backend.modulate(self.surface)
+
+
+def light_room(light_map, t, now, rug_rect, lamps=(), offset=(0, 0)):
+    """Fill the light map for the room: ambient, lantern, fire and lamps."""
+    ox, oy = offset
+    light_map.begin(ambient_light(now))
+    radius, color = LANTERN_LIGHT
+    light_map.add(rug_rect.centerx - ox, rug_rect.top + 18 - oy, radius, color)
+    # fire light breathes with the flame layers drawn by draw_fire
+    flicker = sum(fire_phase(t, i) for i in range(5)) / 5
+    radius, color = FIRE_LIGHT
+    light_map.add(FIRE_POS[0] - ox, FIRE_POS[1] - 40 - oy, radius, color, 0.8 + 0.2 * flicker)
+    radius, color = LAMP_LIGHT
+    for lx, ly in lamps:
+        light_map.add(lx - ox, ly - 34 - oy, radius, color)
+
+
+def draw_lamp(surf, x, y):
+    # small floor lamp: base, pole and warm shade
+    pygame.draw.ellipse(surf, (90, 60, 40), (x - 10, y - 4, 20, 8))
+    pygame.draw.line(surf, (90, 60, 40), (x, y), (x, y - 30), 3)
+    pygame.draw.polygon(surf, (240, 200, 140), [
+        (x - 12, y - 28), (x + 12, y - 28), (x + 7, y - 44), (x - 7, y - 44)])
+
+
+@functools.lru_cache(maxsize=None)
+def ui_font(size):
+    return pygame.font.SysFont(None, size)
+
+
+@functools.lru_cache(maxsize=256)
+def text_sprite(text, size, color):
+    # UI text is baked once per string so render backends can keep it as a sprite
+    return ui_font(size).render(text, True, color)
+
+
+@functools.lru_cache(maxsize=4)
+def clock_sprite(time_str, glows):
+    # clock face with its glow around it, rebuilt when the minute changes
     clock_w, clock_h = 140, 44
-    clock_x, clock_y = WIDTH - clock_w - 20, HEIGHT - clock_h - 20
-    bg_rect = pygame.Rect(clock_x, clock_y, clock_w, clock_h)
+    surf = pygame.Surface((clock_w + 40, clock_h + 40), pygame.SRCALPHA)
+    bg_rect = pygame.Rect(20, 20, clock_w, clock_h)
 
     # --- soft glow aura ---
-    glow = pygame.Surface((clock_w + 40, clock_h + 40), pygame.SRCALPHA)
-    pygame.draw.ellipse(glow, (255, 220, 180, 70), glow.get_rect())
-    surf.blit(glow, (clock_x - 20, clock_y - 20))
+    if glows:
+        surf.blit(glow_surface(clock_w + 40, clock_h + 40, (255, 220, 180, 70)), (0, 0))
 
     # gradient-style background (two-tone cozy beige)
     pygame.draw.rect(surf, (240, 220, 190), bg_rect, border_radius=12)
@@ -413,336 +707,271 @@ def draw_clock(surf):
     # decorative dots (like rivets or lights)
     for i in range(3):
         pygame.draw.circle(surf, (180, 150, 120),
-                           (clock_x + 12 + i*10, clock_y + clock_h - 8), 2)
+                           (bg_rect.x + 12 + i*10, bg_rect.bottom - 8), 2)
 
     # render time text centered
-    font = pygame.font.SysFont(None, 26)
-    txt = font.render(time_str, True, (40, 30, 20))
+    txt = ui_font(26).render(time_str, True, (40, 30, 20))
     txt_rect = txt.get_rect(center=bg_rect.center)
     surf.blit(txt, txt_rect)
 
     # small sparkle flair
     sparkle_color = (255, 240, 200)
-    pygame.draw.circle(surf, sparkle_color,
-                       (clock_x + clock_w - 12, clock_y + 10), 3)
-    pygame.draw.circle(surf, sparkle_color,
-                       (clock_x + clock_w - 18, clock_y + 16), 2)
+    pygame.draw.circle(surf, sparkle_color, (bg_rect.right - 12, bg_rect.y + 10), 3)
+    pygame.draw.circle(surf, sparkle_color, (bg_rect.right - 18, bg_rect.y + 16), 2)
+    return surf
 
 
-def draw_quote(surf):
+def draw_clock(backend, now=None):
+    # get current time (exports pass a fixed one so frames are reproducible)
+    if now is None:
+        now = datetime.datetime.now()
+    time_str = now.strftime("%I:%M %p")  # 12-hour format with AM/PM
+    # the sprite has a 20 px glow margin around the 140x44 face
+    backend.sprite(clock_sprite(time_str, DETAIL['glows']), (WIDTH - 180, HEIGHT - 84))
+
+
+@functools.lru_cache(maxsize=2)
+def quote_sprite(glows):
     quote_text = "\"Creativity is intelligence having fun.\""
 
     # plaque background
     plaque_w, plaque_h = 300, 32
-    plaque_x, plaque_y = 260 + 65, 17
-    plaque_rect = pygame.Rect(plaque_x, plaque_y, plaque_w, plaque_h)
+    surf = pygame.Surface((plaque_w + 20, plaque_h + 20), pygame.SRCALPHA)
+    plaque_rect = pygame.Rect(10, 10, plaque_w, plaque_h)
 
     # background with rounded corners
     pygame.draw.rect(surf, (235, 215, 185), plaque_rect, border_radius=12)
     pygame.draw.rect(surf, (120, 90, 60), plaque_rect, 2, border_radius=12)
 
     # subtle shadow/glow
-    glow = pygame.Surface((plaque_w+20, plaque_h+20), pygame.SRCALPHA)
-    pygame.draw.ellipse(glow, (255, 230, 200, 60), glow.get_rect())
-    surf.blit(glow, (plaque_x-10, plaque_y-10))
+    if glows:
+        surf.blit(glow_surface(plaque_w + 20, plaque_h + 20, (255, 230, 200, 60)), (0, 0))
 
     # render quote centered
-    font = pygame.font.SysFont(None, 23)
-    txt = font.render(quote_text, True, (60, 40, 30))
+    txt = ui_font(23).render(quote_text, True, (60, 40, 30))
     txt_rect = txt.get_rect(center=plaque_rect.center)
     surf.blit(txt, txt_rect)
+    return surf
 
 
-def draw_ui(surf, coziness):
-    # top-left cozy meter
-    pygame.draw.rect(surf, (30, 30, 30), (20, 20, 220, 28), border_radius=6)
-    pygame.draw.rect(surf, (255, 230, 180), (24, 24, int(
-        (coziness/100) * 212), 20), border_radius=5)
-    font = pygame.font.SysFont(None, 20)
-    txt = font.render(f'Cozy: {int(coziness)}', True, (40, 30, 20))
-    surf.blit(txt, (250, 22))
-    # shop button (top-right)
-    pygame.draw.rect(surf, (190, 160, 120), SHOP_BUTTON_RECT, border_radius=6)
-    shop_txt = font.render('Shop', True, (40, 30, 20))
-    surf.blit(shop_txt, (SHOP_BUTTON_RECT.x + 18, SHOP_BUTTON_RECT.y + 6))
-
-
-def main():
-    pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-    pygame.display.set_caption('Cozy Corner')
-    # Create a fixed-size buffer surface for the game
-    game_surface = pygame.Surface((WIDTH, HEIGHT))
-    clock = pygame.time.Clock()
-    player = Player(WIDTH // 2, HEIGHT // 2)
-    teas = [Tea() for _ in range(3)]
-    coziness = 10.0
-    time = 0.0
+def draw_quote(backend):
+    backend.sprite(quote_sprite(DETAIL['glows']), (260 + 65 - 10, 17 - 10))  # 10 px glow margin
 
-    instructions_font = pygame.font.SysFont(None, 20)
 
-    running = True
-    spawn_effects = []
-    teas_collected = 0
-
-    # rug placement (right side)
-    rug_rect = pygame.Rect(WIDTH - 260, HEIGHT - 220, 200, 120)
-    # lantern light position
-    lantern_x, lantern_y = rug_rect.centerx, rug_rect.top + 18
-    # cats
-    cats = [Cat(WIDTH - 200, HEIGHT - 200) for _ in range(CAT_COUNT)]
-
-    # trees for scenery
-    trees = [
-        (80, 120, 1.2),      # left side tree, large
-        (150, 160, 0.9),     # left side tree, medium
-        (WIDTH - 120, 140, 1.1),  # right side tree, large
-        (WIDTH - 200, 180, 0.8),  # right side tree, small
-        (WIDTH // 2 - 100, 130, 1.0),  # center-left tree
-        (WIDTH // 2 + 80, 150, 0.95),  # center-right tree
-    ]
-
-    # fruits on trees
-    fruits = []
-    for tree_x, tree_y, tree_size in trees:
-        # spawn 2-4 fruits per tree
-        for _ in range(random.randint(2, 4)):
-            fruits.append(Fruit(tree_x, tree_y, tree_size))
+@functools.lru_cache(maxsize=16)
+def meter_sprite(fill_w, cozy):
+    # top-left cozy meter and its label
+    surf = pygame.Surface((300, 28), pygame.SRCALPHA)
+    pygame.draw.rect(surf, (30, 30, 30), (0, 0, 220, 28), border_radius=6)
+    pygame.draw.rect(surf, (255, 230, 180), (4, 4, fill_w, 20), border_radius=5)
+    surf.blit(ui_font(20).render(f'Cozy: {cozy}', True, (40, 30, 20)), (230, 2))
+    return surf
 
-    # interaction elements
-    windchime = WindChime(WINDCHIME_POS[0], WINDCHIME_POS[1])
-    bookshelf_cooldown = 0  # cooldown for bookshelf interaction
-    high_cozy_reached = False  # track if player has reached high cozy
-    books_read = 0  # count of bookshelf interactions
 
-    # shop state and items
-    shop_open = False
-    shop_w, shop_h = 420, 340  # taller to fit more items
-    shop_x = WIDTH // 2 - shop_w // 2
-    shop_y = HEIGHT // 2 - shop_h // 2
-    shop_scroll = 0  # scroll position for shop
-
-    def buy_blanket():
-        global RUG_COZY_GAIN
-        RUG_COZY_GAIN += 1.0
-
-    def buy_cat_treat():
-        global CAT_COZY_GAIN
-        CAT_COZY_GAIN += 0.8
-        # spawn an extra friendly cat immediately
-        cats.append(Cat(rug_rect.left - 60, rug_rect.top + 20))
-
-    def buy_firewood():
-        global COZY_SIT_GAIN
-        COZY_SIT_GAIN += 3.0
-
-    def buy_tea_kettle():
-        global TEA_SPAWN_RATE
-        TEA_SPAWN_RATE += 0.02  # spawn teas more frequently
-
-    def buy_cozy_socks():
-        global COZY_DECAY
-        COZY_DECAY *= 0.8  # reduce decay by 20%
-
-    def buy_lamp():
-        global SPAWN_EFFECT_LIFE
-        SPAWN_EFFECT_LIFE += 0.5  # extend positive effects visually
-
-    def buy_music_box():
-        # small coziness boost on purchase
-        nonlocal coziness
-        coziness = min(100.0, coziness + 20)
-
-    def buy_relaxing_chair():
-        global COZY_SIT_GAIN
-        COZY_SIT_GAIN += 2.0
-
-    def buy_dream_tea():
-        # one-time big coziness boost
-        nonlocal coziness
-        coziness = min(100.0, coziness + 35)
-
-    shop_items = [
-        {'id': 'blanket', 'name': 'Cozy Blanket', 'price': 25.0,
-            'desc': '+1 rug cozy', 'bought': False, 'apply': buy_blanket},
-        {'id': 'treat', 'name': 'Cat Treat', 'price': 18.0,
-            'desc': '+0.8 cat cozy + spawn cat', 'bought': False, 'apply': buy_cat_treat},
-        {'id': 'wood', 'name': 'Firewood', 'price': 30.0,
-            'desc': '+3 sit gain', 'bought': False, 'apply': buy_firewood},
-        {'id': 'kettle', 'name': 'Tea Kettle', 'price': 22.0,
-            'desc': 'Spawn tea faster', 'bought': False, 'apply': buy_tea_kettle},
-        {'id': 'socks', 'name': 'Cozy Socks', 'price': 20.0,
-            'desc': 'Decay slower (-20%)', 'bought': False, 'apply': buy_cozy_socks},
-        {'id': 'lamp', 'name': 'Warm Lamp', 'price': 28.0,
-            'desc': 'Effects last longer', 'bought': False, 'apply': buy_lamp},
-        {'id': 'music', 'name': 'Music Box', 'price': 35.0,
-            'desc': '+20 cozy instantly', 'bought': False, 'apply': buy_music_box},
-        {'id': 'chair', 'name': 'Relaxing Chair', 'price': 32.0,
-            'desc': '+2 sit gain', 'bought': False, 'apply': buy_relaxing_chair},
-        {'id': 'dream_tea', 'name': 'Dream Tea', 'price': 50.0,
-            'desc': '+35 cozy bliss', 'bought': False, 'apply': buy_dream_tea},
-    ]
+@functools.lru_cache(maxsize=1)
+def shop_button_sprite():
+    surf = pygame.Surface(SHOP_BUTTON_RECT.size, pygame.SRCALPHA)
+    pygame.draw.rect(surf, (190, 160, 120), surf.get_rect(), border_radius=6)
+    surf.blit(ui_font(20).render('Shop', True, (40, 30, 20)), (18, 6))
+    return surf
 
-    while running:
-        dt = clock.tick(60) / 1000.0
-        time += dt
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    player.sitting = not player.sitting
-                elif event.key == pygame.K_e:
-                    # windchime interaction
-                    dist_to_chime = math.hypot(
-                        player.x - windchime.x, player.y - windchime.y)
-                    if dist_to_chime < 80:
-                        windchime.chime()
-                        coziness = min(100.0, coziness + 5)
-                        spawn_effects.append(SpawnEffect(
-                            windchime.x, windchime.y - 20, 'Ding!'))
-                    # bookshelf interaction
-                    dist_to_shelf = math.hypot(
-                        player.x - BOOKSHELF_POS[0], player.y - BOOKSHELF_POS[1])
-                    if dist_to_shelf < 80 and bookshelf_cooldown <= 0:
-                        books_read += 1
-                        coziness = min(100.0, coziness + 8)
-                        bookshelf_cooldown = 2.0
-                        spawn_effects.append(SpawnEffect(
-                            BOOKSHELF_POS[0], BOOKSHELF_POS[1] + 20, 'Read!'))
-                elif event.key == pygame.K_UP and shop_open:
-                    # scroll shop up
-                    shop_scroll = max(0, shop_scroll - 1)
-                elif event.key == pygame.K_DOWN and shop_open:
-                    # scroll shop down
-                    max_scroll = max(0, len(shop_items) - 7)
-                    shop_scroll = min(max_scroll, shop_scroll + 1)
-            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                mx, my = event.pos
-                # click on fruits
-                for fruit in fruits[:]:
-                    if not fruit.collected:
-                        dist = math.hypot(fruit.x - mx, fruit.y - my)
-                        if dist < fruit.r + 5:  # clickable area
-                            fruit.collected = True
-                            fruit_value, fruit_label = fruit.get_value()
-                            coziness = min(100.0, coziness + fruit_value)
-                            spawn_effects.append(SpawnEffect(
-                                fruit.x, fruit.y, fruit_label))
-                # toggle shop
-                if SHOP_BUTTON_RECT.collidepoint(mx, my):
-                    shop_open = not shop_open
-                    shop_scroll = 0  # reset scroll on open
-                elif shop_open:
-                    # check buy buttons (with scroll offset)
-                    max_visible = 7
-                    for idx, it in enumerate(shop_items):
-                        if idx < shop_scroll or idx >= shop_scroll + max_visible:
-                            continue  # skip off-screen items
-                        screen_idx = idx - shop_scroll
-                        bx = shop_x + 20
-                        by = shop_y + 40 + screen_idx * 40
-                        brect = pygame.Rect(bx + 260, by - 6, 90, 26)
-                        if brect.collidepoint(mx, my) and not it['bought']:
-                            if coziness >= it['price']:
-                                coziness -= it['price']
-                                it['bought'] = True
-                                it['apply']()
-                                spawn_effects.append(
-                                    SpawnEffect(bx + 60, by, 'Buy!'))
+def draw_ui(backend, coziness):
+    backend.sprite(meter_sprite(int((coziness/100) * 212), int(coziness)), (20, 20))
+    # shop button (top-right)
+    backend.sprite(shop_button_sprite(), SHOP_BUTTON_RECT.topleft)
+
+
+@functools.lru_cache(maxsize=1)
+def shop_panel_sprite():
+    surf = pygame.Surface(SHOP_RECT.size, pygame.SRCALPHA)
+    pygame.draw.rect(surf, (245, 230, 200), surf.get_rect(), border_radius=12)
+    pygame.draw.rect(surf, (220, 190, 150), surf.get_rect().inflate(-16, -16),
+                     border_radius=10)
+    surf.blit(ui_font(26).render('Cozy Shop', True, (60, 40, 20)), (18, 12))
+    return surf
+
+
+def rewind_state(sim):
+    """Snapshot everything in sim that changes as {entity_id: {field: value}}, for RewindBuffer."""
+    state = {
+        'g': {'time': sim.time, 'next': sim._next_id, 'treats': sim.has_treats,
+              'owned': tuple(sorted(sim.owned)), 'lamps': tuple(sim.lamps), **sim.tunables},
+        'w': {'ct': sim.windchime.chime_time},
+        'n': {'c': len(sim.cats), 'e': len(sim.effects)},
+    }
+    for pid, p in sim.players.items():
+        state[pid] = {'x': p.x, 'y': p.y, 's': p.sitting, 'm': p.walking,
+                      'w': p.walk_phase, 'wt': p.walk_timer, 'coz': p.coziness,
+                      'teas': p.teas_collected, 'books': p.books_read,
+                      'cool': p.book_cooldown, 'high': p.high_cozy}
+    for tid, t in sim.teas.items():
+        state[tid] = {'x': t.x, 'y': t.y}
+    for i, f in enumerate(sim.fruits):
+        state[f'f{i}'] = f.rewind_fields()
+    for i, c in enumerate(sim.cats):
+        state[f'c{i}'] = {'x': c.x, 'y': c.y, 'd': c._dir, 'tm': c._timer,
+                          'tt': c._tail_time, 'g': c.goal}
+    for i, e in enumerate(sim.effects):
+        state[f'e{i}'] = {'x': e.x, 'y': e.y, 'txt': e.text, 'l': e.life, 'tl': e.total}
+    return state
+
+
+def restore_rewind_state(state, sim):
+    """Put sim back as rewind_state() saw it; its players must be the same ones."""
+    g = state['g']
+    sim.time, sim._next_id, sim.has_treats = g['time'], g['next'], g['treats']
+    sim.owned = set(g['owned'])
+    sim.lamps = list(g['lamps'])
+    for name in SHOP_TUNABLES:
+        sim.tunables[name] = g[name]
+    sim.windchime.chime_time = state['w']['ct']
+    for pid, p in sim.players.items():
+        s = state[pid]
+        p.x, p.y, p.sitting, p.walking = s['x'], s['y'], s['s'], s['m']
+        p.walk_phase, p.walk_timer = s['w'], s['wt']
+        p.coziness, p.teas_collected, p.books_read = s['coz'], s['teas'], s['books']
+        p.book_cooldown, p.high_cozy = s['cool'], s['high']
+    teas = {}
+    for tid, s in state.items():
+        if tid[0] == 't':
+            tea = teas[tid] = sim.teas.get(tid) or Tea()
+            tea.x, tea.y = s['x'], s['y']
+    sim.teas = teas
+    cats, effects, counts = sim.cats, sim.effects, state['n']
+    del cats[counts['c']:], effects[counts['e']:]
+    cats.extend(Cat(0, 0) for _ in range(counts['c'] - len(cats)))
+    effects.extend(SpawnEffect(0, 0) for _ in range(counts['e'] - len(effects)))
+    for i, f in enumerate(sim.fruits):
+        s = state[f'f{i}']
+        if s != f.rewind_fields():
+            f.x, f.y, f.collected = s['x'], s['y'], s['c']
+            f.fruit_type, f.color = s['k'], Fruit.COLORS[s['k']]
+            f._rewind = None
+    sim.picked = sum(f.collected for f in sim.fruits)
+    for i, c in enumerate(cats):
+        s = state[f'c{i}']
+        c.x, c.y, c._dir, c._timer, c._tail_time, c.goal = (
+            s['x'], s['y'], s['d'], s['tm'], s['tt'], s['g'])
+    for i, e in enumerate(effects):
+        s = state[f'e{i}']
+        e.x, e.y, e.text, e.life, e.total = s['x'], s['y'], s['txt'], s['l'], s['tl']
+
+
+def build_home_nav(trees):
+    """Navigation grid for the cats' corner: the fire, bookshelf and tree trunks are blocked."""
+    nav = NavGrid(HOME_RECT)
+    nav.block_rect(FIRE_NAV_RECT)
+    nav.block_rect(BOOKSHELF_RECT.inflate(CAT_CLEARANCE, CAT_CLEARANCE))
+    for x, y, size in trees:
+        trunk_w, trunk_h = int(12 * size), int(30 * size)
+        nav.block_rect(pygame.Rect(x - trunk_w // 2, y, trunk_w, trunk_h)
+                       .inflate(CAT_CLEARANCE, CAT_CLEARANCE))
+    return nav
+
+
+def cat_fields(nav, rug_rect, treat_pos=None):
+    """The flow fields cats choose between this frame (all cached by nav)."""
+    fields = {'rug': nav.flow_to_rect(rug_rect.inflate(-40, -40)),
+              # measured from the blocked footprint, which is CAT_CLEARANCE // 2 wider
+              'flee': nav.flow_away_from_rect(FIRE_NAV_RECT, CAT_FIRE_REACH - CAT_CLEARANCE // 2)}
+    if treat_pos is not None:
+        # snap the target so a moving player costs a new field only every few steps
+        x, y = (int(v) // TREAT_SNAP * TREAT_SNAP + TREAT_SNAP // 2 for v in treat_pos)
+        treat = nav.flow_to_point(x, y)
+        if treat is not None:
+            fields['treat'] = treat
+    return fields
+
+
+def draw_house(surf, x, y, w, h, color):
+    # village house: walls, roof, door and two lit windows
+    pygame.draw.rect(surf, color, (x, y, w, h))
+    pygame.draw.rect(surf, (90, 60, 40), (x, y, w, h), 2)
+    pygame.draw.polygon(surf, (150, 75, 55), [
+        (x - 8, y), (x + w // 2, y - h // 2), (x + w + 8, y)])
+    pygame.draw.rect(surf, (110, 70, 40), (x + w // 2 - 9, y + h - 26, 18, 26))
+    for wx in (x + 12, x + w - 30):
+        pygame.draw.rect(surf, (250, 230, 170), (wx, y + 14, 18, 16))
+        pygame.draw.rect(surf, (90, 60, 40), (wx, y + 14, 18, 16), 1)
+
+
+def tree_rect(tree):
+    # bounding box of draw_tree's trunk and foliage
+    x, y, size = tree
+    r = int(25 * size)
+    return pygame.Rect(x - r, y - r // 2 - r, 2 * r + 1, r + r // 2 + int(30 * size) + 1)
+
+
+def house_rect(house):
+    # bounding box of draw_house including the roof overhang
+    x, y, w, h, _ = house
+    return pygame.Rect(x - 8, y - h // 2, w + 17, h + h // 2 + 1)
+
+
+def generate_village(seed=None):
+    """Houses on a jittered grid of lots and trees scattered between them.
+
+    The cozy corner (HOME_RECT) is left as it is. Returns (trees, houses),
+    each sorted top to bottom so nearer scenery overlaps farther scenery.
+    """
+    rng = random.Random(seed)
+    keep_clear = HOME_RECT.inflate(80, 80)
+    houses = []
+    for ly in range(0, WORLD_H - VILLAGE_LOT, VILLAGE_LOT):
+        for lx in range(0, WORLD_W - VILLAGE_LOT, VILLAGE_LOT):
+            if rng.random() < 0.45:
+                continue
+            w, h = rng.randint(90, 140), rng.randint(70, 100)
+            house = (lx + rng.randint(20, VILLAGE_LOT - w - 30),
+                     ly + rng.randint(h // 2 + 10, VILLAGE_LOT - h - 10), w, h,
+                     rng.choice([(225, 200, 165), (210, 180, 150), (235, 215, 190)]))
+            if not house_rect(house).colliderect(keep_clear):
+                houses.append(house)
+    blocked = [house_rect(h).inflate(20, 20) for h in houses] + [keep_clear]
+    trees = []
+    while len(trees) < VILLAGE_TREES:
+        tree = (rng.randint(30, WORLD_W - 30), rng.randint(60, WORLD_H - 40),
+                round(rng.uniform(0.8, 1.3), 2))
+        if tree_rect(tree).collidelist(blocked) == -1:
+            trees.append(tree)
+    trees.sort(key=lambda t: t[1])
+    houses.sort(key=lambda h: h[1])
+    return trees, houses
+
+
+def draw_scenery(surf, offset, trees, houses=(), rug_rect=None):
+    """Draw static scenery shifted by offset.
+
+    Hills, houses and trees always; the rug and bookshelf of the cozy
+    corner when rug_rect is given.
+    """
+    ox, oy = offset
+
+    # distant hills
+    pygame.draw.ellipse(surf, (200, 185, 160),
+                        (-100 - ox, HEIGHT - 250 - oy, 500, 260))
+    pygame.draw.ellipse(surf, (210, 195, 170),
+                        (300 - ox, HEIGHT - 260 - oy, 600, 260))
+
+    for x, y, w, h, color in houses:
+        draw_house(surf, x - ox, y - oy, w, h, color)
+
+    # trees in the background
+    for tree_x, tree_y, tree_size in trees:
+        draw_tree(surf, tree_x - ox, tree_y - oy, tree_size)
 
-        keys = pygame.key.get_pressed()
-        dx = dy = 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            dx -= player.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            dx += player.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            dy -= player.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            dy += player.speed
-
-        player.move(dx, dy)
-        player.update(dt)
-
-        # update bookshelf cooldown
-        bookshelf_cooldown = max(0, bookshelf_cooldown - dt)
-
-        # update windchime
-        windchime.update(dt)
-
-        # collision with tea
-        for t in teas[:]:
-            dist = math.hypot(player.x - t.x, player.y - t.y)
-            if dist < player.r + t.r:
-                teas.remove(t)
-                coziness = min(100, coziness + 12)
-                teas_collected += 1
-                spawn_effects.append(SpawnEffect(t.x, t.y, 'Sip!'))
-                # spawn a new tea slowly
-                if random.random() < 0.6:
-                    new_tea = Tea()
-                    teas.append(new_tea)
-                    spawn_effects.append(
-                        SpawnEffect(new_tea.x, new_tea.y, 'Tea!'))
-
-        # passive cozy gain when sitting near fire
-        fire_x, fire_y = 140, HEIGHT - 160
-        if player.sitting and math.hypot(player.x - fire_x, player.y - (fire_y - 20)) < 120:
-            # time-proportional sitting gain (points per second)
-            coziness = min(100.0, coziness + COZY_SIT_GAIN * dt)
-
-        # coziness decays over time
-        coziness = max(0.0, coziness - COZY_DECAY * dt)
-
-        # track high cozy milestone
-        if coziness >= HIGH_COZY_THRESHOLD and not high_cozy_reached:
-            high_cozy_reached = True
-            spawn_effects.append(SpawnEffect(WIDTH // 2, 100, 'Cozy!'))
-
-        # occasional random tea spawn (low rate, capped)
-        if len(teas) < TEA_MAX and random.random() < TEA_SPAWN_RATE * dt:
-            # try a few times to find a spawn location not too close to player or fire
-            for _ in range(8):
-                nx = random.randint(40, WIDTH - 40)
-                ny = random.randint(120, HEIGHT - 80)
-                if math.hypot(nx - player.x, ny - player.y) > 80 and math.hypot(nx - fire_x, ny - fire_y) > 100:
-                    new_tea = Tea()
-                    teas.append(new_tea)
-                    spawn_effects.append(
-                        SpawnEffect(new_tea.x, new_tea.y, 'Tea!'))
-                    break
+    if rug_rect is None:
+        return
+    rug_rect = rug_rect.move(-ox, -oy)
 
-        # draw
-        game_surface.fill(BG_COLOR)
-
-        # lantern glow (simple translucent circle)
-        glow = pygame.Surface((220, 220), pygame.SRCALPHA)
-        gx = 110
-        gy = 40
-        pygame.draw.circle(glow, (255, 240, 200, 90), (gx, gy), 80)
-        game_surface.blit(glow, (lantern_x - gx, lantern_y - gy))
-
-        # distant hills
-        pygame.draw.ellipse(game_surface, (200, 185, 160),
-                            (-100, HEIGHT - 250, 500, 260))
-        pygame.draw.ellipse(game_surface, (210, 195, 170),
-                            (300, HEIGHT - 260, 600, 260))
-
-        # trees in the background
-        for tree_x, tree_y, tree_size in trees:
-            draw_tree(game_surface, tree_x, tree_y, tree_size)
-
-        # fireplace
-        draw_fire(game_surface, fire_x, fire_y, time)
-
-        # rug (cozy carpet) - more realistic
-        pygame.draw.rect(game_surface, (210, 170, 140),
-                         rug_rect, border_radius=12)
-        pygame.draw.rect(game_surface, (195, 150, 110),
-                         rug_rect.inflate(-8, -8), border_radius=10)
+    # rug (cozy carpet) - more realistic
+    pygame.draw.rect(surf, (210, 170, 140),
+                     rug_rect, border_radius=12)
+    pygame.draw.rect(surf, (195, 150, 110),
+                     rug_rect.inflate(-8, -8), border_radius=10)
 
+    if DETAIL['rug_fringe']:
         # variable for tassel count
         TASSEL_COUNT = 11  # change this number to control how many tassels per side
 
@@ -750,151 +979,822 @@ def main():
         for i in range(TASSEL_COUNT):
             y = rug_rect.top + (i + 0.8) * (rug_rect.height // TASSEL_COUNT)
             # left tassels
-            pygame.draw.line(game_surface, (160, 120, 90),
+            pygame.draw.line(surf, (160, 120, 90),
                              (rug_rect.left, y), (rug_rect.left - 6, y), 2)
             # right tassels
-            pygame.draw.line(game_surface, (160, 120, 90),
+            pygame.draw.line(surf, (160, 120, 90),
                              (rug_rect.right, y), (rug_rect.right + 6, y), 2)
 
         # subtle woven pattern (horizontal stripes)
         for i in range(0, rug_rect.height, 12):
-            pygame.draw.line(game_surface, (180, 140, 110),
+            pygame.draw.line(surf, (180, 140, 110),
                              (rug_rect.left + 6, rug_rect.top + i),
                              (rug_rect.right - 6, rug_rect.top + i), 1)
 
-        # windchime
-        windchime.draw(game_surface)
+    # bookshelf
+    shelf_x, shelf_y = BOOKSHELF_POS[0] - ox, BOOKSHELF_POS[1] - oy
+    pygame.draw.rect(surf, (120, 80, 40),
+                     (shelf_x - 20, shelf_y - 30, 40, 60), border_radius=4)
+    for i in range(3):
+        for j in range(2):
+            book_x = shelf_x - 12 + j * 8
+            book_y = shelf_y - 20 + i * 12
+            color = (200 - i * 30, 100 + j * 40, 60 + i * 20)
+            pygame.draw.rect(surf, color, (book_x, book_y, 6, 10))
+
+
+def draw_room(surf, t, trees, rug_rect, windchime):
+    """Draw the single-screen cozy corner: scenery, fire, rug, windchime and bookshelf."""
+    surf.fill(BG_COLOR)
+    draw_scenery(surf, (0, 0), trees, (), rug_rect)
+    draw_fire(surf, FIRE_POS[0], FIRE_POS[1], t)
+    windchime.draw(surf)
+
+
+class CozySim:
+    """The cozy corner's game rules, without input handling or drawing.
+
+    main() runs one for its single player and the room server runs one per
+    shared room (CozyRoom). Both feed in input through the methods below and
+    advance it with move_players() and then update(). Players share the
+    fire, teas, fruits, cats, lamps and purchases; each keeps their own
+    coziness. Players and teas carry stable string ids ('p1', 't4').
+
+    Purchases change `tunables`, this sim's own copy of the SHOP_TUNABLES
+    module values. on_event(kind, value, value2, label), if given, receives
+    cozy_telemetry events.
+    """
+
+    def __init__(self, trees=TREES, on_event=None):
+        self.time = 0.0
+        self.trees = list(trees)
+        self.on_event = on_event
+        self.tunables = {name: globals()[name] for name in SHOP_TUNABLES}
+        self.players = {}
+        self.inputs = {}
+        self.teas = {}
+        self._next_id = 0
+        for _ in range(3):
+            self._add_tea(Tea())
+        self.rug_rect = RUG_RECT.copy()
+        self.cats = [Cat(WIDTH - 200, HEIGHT - 200) for _ in range(CAT_COUNT)]
+        # fruits on trees, found by position like the scenery
+        self.fruits = []
+        self.fruit_trees = []  # tree each fruit grows on, for regrowing
+        self.fruit_grid = SpatialGrid()
+        self.picked = 0  # fruits collected and not grown back yet
+        for tree in self.trees:
+            # spawn 2-4 fruits per tree
+            for _ in range(random.randint(2, 4)):
+                self.fruit_grid.insert(len(self.fruits), tree_rect(tree))
+                self.fruits.append(Fruit(*tree))
+                self.fruit_trees.append(tree)
+        # cats find their way around the corner on shared flow fields
+        self.nav = build_home_nav(self.trees)
+        self.windchime = WindChime(WINDCHIME_POS[0], WINDCHIME_POS[1])
+        self.effects = []  # floating labels (SpawnEffect), in world coordinates
+        self.owned = set()  # ids of shop items bought
+        self.lamps = []
+        self.has_treats = False
+        self.calling = None  # id of the player holding out a treat, if any
+
+    def _new_id(self, prefix):
+        self._next_id += 1
+        return f'{prefix}{self._next_id}'
+
+    def _add_tea(self, tea):
+        self.teas[self._new_id('t')] = tea
+        return tea
+
+    def _log(self, kind, value=0.0, value2=0.0, label=''):
+        if self.on_event is not None:
+            self.on_event(kind, value, value2, label)
+
+    def announce(self, x, y, text):
+        """Float a label up from (x, y), in world coordinates."""
+        self.effects.append(SpawnEffect(x, y, text, self.tunables['SPAWN_EFFECT_LIFE']))
+
+    def add_player(self, x=WIDTH // 2, y=HEIGHT // 2, bounds=HOME_RECT):
+        pid = self._new_id('p')
+        self.players[pid] = Player(x, y, bounds)
+        self.inputs[pid] = (0, 0)
+        return pid
+
+    def remove_player(self, pid):
+        self.players.pop(pid, None)
+        self.inputs.pop(pid, None)
+        if self.calling == pid:
+            self.calling = None
+
+    def set_input(self, pid, dx, dy):
+        """Set a player's held direction; dx and dy are clamped to -1..1."""
+        if pid in self.inputs:
+            self.inputs[pid] = (max(-1, min(1, int(dx))), max(-1, min(1, int(dy))))
+
+    def toggle_sit(self, pid):
+        player = self.players.get(pid)
+        if player is not None:
+            player.sitting = not player.sitting
+            self._log(cozy_telemetry.SIT, float(player.sitting))
+
+    def interact(self, pid):
+        """Ring the windchime and read at the bookshelf, whichever the player is near."""
+        player = self.players.get(pid)
+        if player is None:
+            return
+        chime = self.windchime
+        if math.hypot(player.x - chime.x, player.y - chime.y) < 80:
+            chime.chime()
+            player.coziness = min(100.0, player.coziness + 5)
+            self.announce(chime.x, chime.y - 20, 'Ding!')
+        if (math.hypot(player.x - BOOKSHELF_POS[0], player.y - BOOKSHELF_POS[1]) < 80
+                and player.book_cooldown <= 0):
+            player.books_read += 1
+            self._log(cozy_telemetry.BOOK, player.books_read)
+            player.coziness = min(100.0, player.coziness + 8)
+            player.book_cooldown = 2.0
+            self.announce(BOOKSHELF_POS[0], BOOKSHELF_POS[1] + 20, 'Read!')
+
+    def click(self, pid, x, y):
+        """Pick the fruit under (x, y), in world coordinates, for the player."""
+        player = self.players.get(pid)
+        if player is None:
+            return
+        # fruits hang within a fruit's reach of their tree's rect
+        for i in self.fruit_grid.query(pygame.Rect(x - 40, y - 40, 80, 80)):
+            fruit = self.fruits[i]
+            if not fruit.collected and math.hypot(fruit.x - x, fruit.y - y) < fruit.r + 5:
+                fruit.collected = True
+                self.picked += 1
+                fruit_value, fruit_label = fruit.get_value()
+                player.coziness = min(100.0, player.coziness + fruit_value)
+                self._log(cozy_telemetry.FRUIT, fruit_value, label=fruit.fruit_type)
+                self.announce(fruit.x, fruit.y, fruit_label)
+
+    def buy(self, pid, item):
+        """Buy a shop item with the player's coziness; False if owned or unaffordable."""
+        player = self.players.get(pid)
+        if player is None or item.id in self.owned or player.coziness < item.price:
+            return False
+        player.coziness -= item.price
+        self.owned.add(item.id)
+        for effect in item.effects:
+            op = effect['op']
+            if op == 'add':
+                self.tunables[effect['target']] += effect['value']
+            elif op == 'mul':
+                self.tunables[effect['target']] *= effect['value']
+            elif op == 'coziness':
+                player.coziness = min(100.0, player.coziness + effect['value'])
+            elif op == 'unlock':
+                self.has_treats = True  # hold T to call the cats over
+            elif effect['what'] == 'cat':
+                # an extra friendly cat turns up straight away
+                self.cats.append(Cat(self.rug_rect.left - 60, self.rug_rect.top + 20))
+            else:
+                self.lamps.append((self.rug_rect.left - 30, self.rug_rect.top + 10))
+        self._log(cozy_telemetry.PURCHASE, item.price, label=item.id)
+        return True
+
+    def move_players(self, dt):
+        for pid, player in self.players.items():
+            dx, dy = self.inputs[pid]
+            # Player.speed is pixels per 60 FPS frame; scale to the step length
+            step_px = player.speed * dt * 60
+            player.move(dx * step_px, dy * step_px)
+            player.update(dt)
+
+    def update(self, dt, area=HOME_RECT):
+        """Advance everything but player movement by dt seconds.
+
+        area is the part of the world being watched (main() passes the
+        camera view): new teas appear in it, teas far outside it go cold,
+        and only fruits in it grow back.
+        """
+        self.time += dt
+        tune = self.tunables
+        fire_x, fire_y = FIRE_POS
+        self.windchime.update(dt)
+        for player in self.players.values():
+            player.book_cooldown = max(0, player.book_cooldown - dt)
+            # collision with tea
+            for tid, t in list(self.teas.items()):
+                if math.hypot(player.x - t.x, player.y - t.y) < player.r + t.r:
+                    del self.teas[tid]
+                    player.coziness = min(100, player.coziness + 12)
+                    player.teas_collected += 1
+                    self._log(cozy_telemetry.TEA, player.teas_collected)
+                    self.announce(t.x, t.y, 'Sip!')
+                    # spawn a new tea slowly
+                    if random.random() < 0.6:
+                        new_tea = self._add_tea(Tea(area))
+                        self.announce(new_tea.x, new_tea.y, 'Tea!')
+            # passive cozy gain when sitting near fire
+            if player.sitting and math.hypot(player.x - fire_x, player.y - (fire_y - 20)) < 120:
+                player.coziness = min(100.0, player.coziness + tune['COZY_SIT_GAIN'] * dt)
+            # coziness decays over time
+            player.coziness = max(0.0, player.coziness - tune['COZY_DECAY'] * dt)
+            # track high cozy milestone
+            if player.coziness >= HIGH_COZY_THRESHOLD and not player.high_cozy:
+                player.high_cozy = True
+                self.announce(area.centerx, area.y + 100, 'Cozy!')
+
+        # teas left a screen or more behind go cold
+        nearby = area.inflate(WIDTH * 2, HEIGHT * 2)
+        self.teas = {tid: t for tid, t in self.teas.items() if nearby.collidepoint(t.x, t.y)}
+
+        # occasional random tea spawn in the area (low rate, capped)
+        in_area = sum(area.collidepoint(t.x, t.y) for t in self.teas.values())
+        if in_area < TEA_MAX and random.random() < tune['TEA_SPAWN_RATE'] * dt:
+            # try a few times to find a spawn location not too close to a player or the fire
+            for _ in range(8):
+                tea = Tea(area)
+                if (all(math.hypot(tea.x - p.x, tea.y - p.y) > 80 for p in self.players.values())
+                        and math.hypot(tea.x - fire_x, tea.y - fire_y) > 100):
+                    self._add_tea(tea)
+                    self.announce(tea.x, tea.y, 'Tea!')
+                    break
 
-        # bookshelf
-        pygame.draw.rect(game_surface, (120, 80, 40),
-                         (BOOKSHELF_POS[0] - 20, BOOKSHELF_POS[1] - 30, 40, 60), border_radius=4)
-        for i in range(3):
-            for j in range(2):
-                book_x = BOOKSHELF_POS[0] - 12 + j * 8
-                book_y = BOOKSHELF_POS[1] - 20 + i * 12
-                color = (200 - i * 30, 100 + j * 40, 60 + i * 20)
-                pygame.draw.rect(game_surface, color, (book_x, book_y, 6, 10))
-
-        # teas
-        for t in teas:
-            t.draw(game_surface)
-
-        # fruits on trees
-        for fruit in fruits:
-            fruit.draw(game_surface)
-        # respawn collected fruits occasionally
-        for i in range(len(fruits)):
-            # ~0.2% per frame = respawn after ~8 sec on average
-            if fruits[i].collected and random.random() < 0.002:
-                # respawn the fruit
-                tree_x, tree_y, tree_size = trees[i % len(trees)]
-                fruits[i] = Fruit(tree_x, tree_y, tree_size)
-
-        # cats update & draw
-        for c in cats:
-            c.update(dt)
-            c.draw(game_surface)
-            # if player close to cat, small cozy gain
-            if math.hypot(player.x - c.x, player.y - c.y) < 60:
-                coziness = min(100.0, coziness + CAT_COZY_GAIN * dt)
-
-        # rug cozy gain when standing on it
-        if rug_rect.collidepoint(int(player.x), int(player.y)):
-            # standing provides a small passive boost
-            coziness = min(100.0, coziness + RUG_COZY_GAIN * dt)
-
-        # update & draw spawn effects (draw above teas/player)
-        for e in spawn_effects[:]:
+        # picked fruits grow back (ones out of view can wait)
+        if self.picked:
+            for i in self.fruit_grid.query(area):
+                if self.fruits[i].collected and random.random() < FRUIT_REGROW_RATE * dt:
+                    self.fruits[i] = Fruit(*self.fruit_trees[i])
+                    self.picked -= 1
+
+        # cats, and the coziness of being near one or standing on the rug
+        caller = self.players.get(self.calling) if self.has_treats else None
+        fields = cat_fields(self.nav, self.rug_rect,
+                            (caller.x, caller.y) if caller is not None else None)
+        for c in self.cats:
+            c.update(dt, self.nav, fields)
+            for player in self.players.values():
+                if math.hypot(player.x - c.x, player.y - c.y) < 60:
+                    player.coziness = min(100.0, player.coziness + tune['CAT_COZY_GAIN'] * dt)
+        for player in self.players.values():
+            if self.rug_rect.collidepoint(int(player.x), int(player.y)):
+                player.coziness = min(100.0, player.coziness + tune['RUG_COZY_GAIN'] * dt)
+
+        for e in self.effects[:]:
             e.update(dt)
             if e.life <= 0:
-                spawn_effects.remove(e)
+                self.effects.remove(e)
+
+
+class CozyRoom(CozySim):
+    """One shared room, stepped headlessly by the room server.
+
+    Snapshots key entities by stable string ids ('p1', 't4', 'f0', 'c0')
+    so they can be diffed field by field between ticks.
+    """
+
+    def step(self, dt):
+        self.move_players(dt)
+        self.update(dt)
+
+    def snapshot(self):
+        """Return {entity_id: {field: value}} with positions rounded to whole pixels."""
+        snap = {}
+        for pid, p in self.players.items():
+            snap[pid] = {'x': int(p.x), 'y': int(p.y), 's': int(p.sitting),
+                         'm': int(p.walking), 'w': p.walk_phase,
+                         'z': int(p.coziness)}
+        for tid, t in self.teas.items():
+            snap[tid] = {'x': t.x, 'y': t.y}
+        for i, f in enumerate(self.fruits):
+            snap[f'f{i}'] = {'x': int(f.x), 'y': int(f.y), 'r': f.r,
+                             'k': f.fruit_type, 'c': int(f.collected)}
+        for i, c in enumerate(self.cats):
+            snap[f'c{i}'] = {'x': int(c.x), 'y': int(c.y)}
+        return snap
+
+
+def main(args=None):
+    if args is None:
+        args = parse_args([])
+    exporting = args.export_frames is not None
+    if exporting:
+        # render offscreen at a fixed dt with reproducible randomness
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        random.seed(args.seed)
+    pygame.init()
+    clock = pygame.time.Clock()
+    exporter = script = export_surface = None
+    frame = 0
+    show_debug = False
+    # session telemetry (opt-in); events go to a ring flushed by a writer thread
+    telemetry = None
+    if args.telemetry:
+        telemetry = cozy_telemetry.Telemetry(args.telemetry)
+    telemetry_timer = 0.0
+    frame_times = []
+
+    def log_event(kind, value=0.0, value2=0.0, label=''):
+        if telemetry is not None:
+            telemetry.log(kind, value, value2, label)
+    if exporting:
+        from cozy_export import FrameExporter, InputScript
+        export_surface = FrameExporter.make_surface((WIDTH, HEIGHT))
+        script = InputScript.load(args.script) if args.script else InputScript([])
+        export_clock = datetime.datetime(2024, 12, 21, 19, 30)
+    # the surface backend draws straight into the export surface
+    backend = open_backend(args.render_backend, (WIDTH, HEIGHT), target=export_surface)
+    # detail governor; exports render at a fixed level so frames are reproducible
+    forced_detail = args.detail
+    if forced_detail is None and exporting:
+        forced_detail = 0
+    governor = QualityGovernor(args.frame_budget, forced=forced_detail,
+                               ignored=backend.ignored_detail)
+    set_detail_level(governor.level)
+
+    instructions_font = pygame.font.SysFont(None, 20)
+
+    running = True
+
+    # lighting: lantern and fire are built in, lamps come from the shop
+    light_map = LightMap((WIDTH, HEIGHT))
+    # weather drifting over the trees
+    weather = None
+    if args.weather != 'none':
+        from cozy_weather import WeatherLayer
+        weather = WeatherLayer(args.weather, args.weather_count,
+                               seed=args.seed if exporting else None)
+
+    # trees for scenery: the cozy corner's own plus the village around it
+    village_trees, houses = generate_village(args.seed)
+    trees = list(TREES) + village_trees
+
+    # the game rules; this function only turns input into calls on sim and draws it
+    sim = CozySim(trees, on_event=log_event)
+    pid = sim.add_player(WIDTH // 2, HEIGHT // 2, bounds=WORLD_RECT)
+    player = sim.players[pid]
+
+    # static scenery is indexed by position and pre-rendered into chunks
+    # as the camera reaches it
+    camera = Camera((WIDTH, HEIGHT), WORLD_RECT)
+    scenery = SpatialGrid()
+    for house in houses:
+        scenery.insert(('house', house), house_rect(house))
+    for tree in trees:
+        scenery.insert(('tree', tree), tree_rect(tree))
+
+    def render_chunk(chunk, rect):
+        chunk.fill(BG_COLOR)
+        items = scenery.query(rect)
+        draw_scenery(chunk, rect.topleft,
+                     [it for kind, it in items if kind == 'tree'],
+                     [it for kind, it in items if kind == 'house'],
+                     sim.rug_rect if rect.colliderect(HOME_RECT) else None)
+
+    chunks = ChunkCache(render_chunk)
+
+    # shop: the catalog is data, what has been bought is in sim
+    shop_open = False
+    catalog = cozy_shop.Catalog.load(tunables=SHOP_TUNABLES)
+    shop = cozy_shop.ShopList(SHOP_LIST_RECT, ui_font(18), catalog.items)
+    shop_filters = [None] + catalog.categories  # Tab cycles: all, then each category
+    shop_filter = 0
+    shop_search = None  # text typed after '/', or None when not searching
+
+    # rewind: hold R to step back through recent history, let go to play on from there
+    history = None
+    if args.rewind_seconds > 0:
+        history = RewindBuffer(args.rewind_seconds)
+    rewind_tick = None  # history tick on screen while rewinding
+
+    def show_shop_items():
+        if shop_search is not None:
+            shop.set_items(catalog.search(shop_search))
+        elif shop_filters[shop_filter] is None:
+            shop.set_items(catalog.items)
+        else:
+            shop.set_items(catalog.by_category[shop_filters[shop_filter]])
+
+    # the exporter starts worker processes and a shared-memory ring; release
+    # them however the loop ends
+    if exporting:
+        exporter = FrameExporter(args.export_frames, (WIDTH, HEIGHT),
+                                 reference_dir=args.reference_dir,
+                                 workers=args.export_workers)
+    try:
+        while running:
+            if exporting:
+                dt = 1.0 / args.fps
+                events = pygame.event.get() + script.events(frame)
+            else:
+                dt = clock.tick(60) / 1000.0
+                events = pygame.event.get()
+                # work time of the last frame, excluding the frame-limiter sleep
+                frame_times.append(clock.get_rawtime())
+                level = governor.record(frame_times[-1])
+                if DETAIL is not DETAIL_LEVELS[level] and set_detail_level(level):
+                    chunks.invalidate(HOME_RECT)
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and shop_open and shop_search is not None:
+                    # typing a shop search; Enter keeps the results, Escape clears them
+                    if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER, pygame.K_ESCAPE):
+                        if event.key == pygame.K_ESCAPE or not shop_search:
+                            shop_search = None
+                            show_shop_items()
+                        else:
+                            shop_search = None
+                    elif event.key == pygame.K_BACKSPACE:
+                        shop_search = shop_search[:-1]
+                        show_shop_items()
+                    elif event.unicode.isprintable() and event.unicode:
+                        shop_search += event.unicode
+                        show_shop_items()
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        sim.toggle_sit(pid)
+                    elif event.key == pygame.K_F3:
+                        show_debug = not show_debug
+                    elif event.key == pygame.K_e:
+                        # windchime / bookshelf interaction
+                        sim.interact(pid)
+                    elif event.key in (pygame.K_UP, pygame.K_DOWN) and shop_open:
+                        shop.scroll_by(1 if event.key == pygame.K_DOWN else -1)
+                    elif event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN) and shop_open:
+                        shop.scroll_by(shop.visible if event.key == pygame.K_PAGEDOWN
+                                       else -shop.visible)
+                    elif event.key == pygame.K_TAB and shop_open:
+                        shop_filter = (shop_filter + 1) % len(shop_filters)
+                        show_shop_items()
+                    elif event.key == pygame.K_SLASH and shop_open:
+                        shop_search = ''
+                        show_shop_items()
+                elif event.type == pygame.MOUSEWHEEL and shop_open:
+                    shop.scroll_by(-event.y)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    mx, my = backend.to_game(event.pos)
+                    # click on fruits
+                    sim.click(pid, *camera.to_world(mx, my))
+                    # toggle shop
+                    if SHOP_BUTTON_RECT.collidepoint(mx, my):
+                        shop_open = not shop_open
+                        if shop_search is not None:
+                            shop_search = None  # a search being typed ends with the shop
+                            show_shop_items()
+                        shop.scroll = 0  # reset scroll on open
+                    elif shop_open:
+                        hit = shop.item_at((mx, my))
+                        if hit is not None and sim.buy(pid, hit[1]):
+                            row = shop.button_rect(hit[0])
+                            sim.announce(*camera.to_world(shop.rect.x + 60, row.y + 6), 'Buy!')
+
+            keys = script if exporting else pygame.key.get_pressed()
+            # while a shop search is being typed, letters go into the search, not the game
+            typing = shop_open and shop_search is not None
+            dx = dy = 0
+            if not typing:
+                dx = ((keys[pygame.K_RIGHT] or keys[pygame.K_d])
+                      - (keys[pygame.K_LEFT] or keys[pygame.K_a]))
+                dy = ((keys[pygame.K_DOWN] or keys[pygame.K_s])
+                      - (keys[pygame.K_UP] or keys[pygame.K_w]))
+            sim.set_input(pid, dx, dy)
+            sim.calling = pid if keys[pygame.K_t] and not typing else None
+
+            if history is not None and history.tick >= 0 and keys[pygame.K_r] and not typing:
+                if rewind_tick is None:
+                    rewind_tick = history.tick
+                rewind_tick = max(history.oldest, rewind_tick - REWIND_SPEED)
+                restore_rewind_state(history.state_at(rewind_tick), sim)
+                # the frame still runs, frozen, to draw the restored state
+                dt = 0
+            elif rewind_tick is not None:
+                history.truncate(rewind_tick)
+                rewind_tick = None
+
+            if rewind_tick is None:
+                sim.move_players(dt)
+            camera.follow(player.x, player.y)
+            view = camera.rect
+            offset = camera.offset
+            if rewind_tick is None:
+                sim.update(dt, view)
+                if history is not None:
+                    history.record(rewind_state(sim), sim.time)
+
+            # once a second: coziness sample and frame-time stats
+            telemetry_timer += dt
+            if telemetry_timer >= 1.0:
+                telemetry_timer -= 1.0
+                log_event(cozy_telemetry.COZINESS, player.coziness)
+                if frame_times:
+                    log_event(cozy_telemetry.FRAME, sum(frame_times) / len(frame_times),
+                              max(frame_times))
+                frame_times.clear()
+
+            # draw: cached scenery chunks, then only what is inside the view
+            backend.begin()
+            chunks.draw(backend, view)
+            layer = backend.layer()  # everything up to the lighting is drawn fresh each frame
+            draw_fire(layer, FIRE_POS[0] - offset[0], FIRE_POS[1] - offset[1], sim.time)
+            sim.windchime.draw(layer, offset)
+            for lamp_x, lamp_y in sim.lamps:
+                draw_lamp(layer, lamp_x - offset[0], lamp_y - offset[1])
+
+            # teas
+            for t in sim.teas.values():
+                if view.collidepoint(t.x, t.y):
+                    t.draw(layer, offset)
+
+            # fruits on visible trees
+            for i in sim.fruit_grid.query(view):
+                sim.fruits[i].draw(layer, offset)
+
+            # weather over the trees
+            if weather is not None:
+                weather.update(dt)
+                weather.draw(layer)
+
+            for c in sim.cats:
+                if view.inflate(80, 80).collidepoint(c.x, c.y):
+                    c.draw(layer, offset)
+
+            # spawn effects (draw above teas/player)
+            for e in sim.effects:
+                e.draw(layer, instructions_font, offset)
+
+            player.draw(layer, offset)
+
+            # lighting (scene only; the UI below stays unlit)
+            if exporting:
+                now = export_clock + datetime.timedelta(seconds=sim.time)
             else:
-                e.draw(game_surface, instructions_font)
-
-        player.draw(game_surface)
-
-        draw_ui(game_surface, coziness)
-        draw_clock(game_surface)
-        draw_quote(game_surface)
-
-        # shop panel
-        if shop_open:
-            # dim background
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((20, 20, 20, 120))
-            game_surface.blit(overlay, (0, 0))
-
-            # panel
-            pygame.draw.rect(game_surface, (245, 230, 200), (shop_x,
-                             shop_y, shop_w, shop_h), border_radius=12)
-            pygame.draw.rect(game_surface, (220, 190, 150), (shop_x + 8,
-                             shop_y + 8, shop_w - 16, shop_h - 16), border_radius=10)
-            title_font = pygame.font.SysFont(None, 26)
-            title = title_font.render('Cozy Shop', True, (60, 40, 20))
-            game_surface.blit(title, (shop_x + 18, shop_y + 12))
-
-            # items (scrollable)
-            item_font = pygame.font.SysFont(None, 18)
-            max_visible = 7  # show up to 7 items at a time
-            for idx, it in enumerate(shop_items):
-                if idx < shop_scroll or idx >= shop_scroll + max_visible:
-                    continue  # skip off-screen items
-                screen_idx = idx - shop_scroll
-                ix = shop_x + 20
-                iy = shop_y + 40 + screen_idx * 40
-                # item background
-                pygame.draw.rect(game_surface, (255, 245, 230),
-                                 (ix, iy - 6, shop_w - 56, 34), border_radius=8)
-                name = item_font.render(f"{it['name']}", True, (50, 30, 20))
-                desc = item_font.render(it['desc'], True, (90, 70, 50))
-                game_surface.blit(name, (ix + 6, iy))
-                game_surface.blit(desc, (ix + 6, iy + 16))
-                # buy button
-                bx = ix + 260
-                by = iy - 6
-                brect = pygame.Rect(bx, by, 90, 26)
-                if it['bought']:
-                    pygame.draw.rect(game_surface, (170, 170, 170),
-                                     brect, border_radius=6)
-                    btxt = item_font.render('Owned', True, (100, 100, 100))
+                now = datetime.datetime.now()
+            if DETAIL['lighting']:
+                light_room(light_map, sim.time, now, sim.rug_rect, sim.lamps, offset)
+                light_map.apply(backend)
+
+            # UI: all baked sprites
+            draw_ui(backend, player.coziness)
+            draw_clock(backend, now)
+            draw_quote(backend)
+
+            # shop panel
+            if shop_open:
+                backend.fill((0, 0, WIDTH, HEIGHT), (20, 20, 20, 120))  # dim background
+                backend.sprite(shop_panel_sprite(), SHOP_RECT.topleft)
+                if shop_search is not None:
+                    heading = f'Search: {shop_search}_'
                 else:
-                    btn_color = (160, 120, 80) if coziness >= it['price'] else (
-                        200, 180, 160)
-                    pygame.draw.rect(game_surface, btn_color,
-                                     brect, border_radius=6)
-                    btxt = item_font.render(
-                        f"Buy {int(it['price'])}", True, (255, 245, 230))
-                game_surface.blit(btxt, (bx + 12, by + 5))
-
-            # scroll indicator
-            if len(shop_items) > max_visible:
-                scroll_font = pygame.font.SysFont(None, 16)
-                scroll_txt = scroll_font.render(
-                    f"Scroll: {shop_scroll + 1}-{min(shop_scroll + max_visible, len(shop_items))}/{len(shop_items)}", True, (100, 80, 60))
-                game_surface.blit(
-                    scroll_txt, (shop_x + 20, shop_y + shop_h - 28))
-
-        # instructions
-        lines = [
-            'Move: Arrow keys / WASD | Space: Sit/Stand | E: Interact (windchime/book)',
-            'Sit near fire for cozy gain, collect tea, go on rug for boost',
-            f'High cozy: {int(coziness)}/{HIGH_COZY_THRESHOLD} | Books read: {books_read} | Teas collected: {teas_collected}',
-            'Click fruits on trees for coziness | Click "Shop" to buy upgrades'
-        ]
-        for i, l in enumerate(lines):
-            img = instructions_font.render(l, True, (70, 50, 40))
-            game_surface.blit(img, (20, HEIGHT - 24 * (len(lines) - i)))
-
-        # scale game_surface to fit current window and display
-        scaled_surface = pygame.transform.scale(
-            game_surface, screen.get_size())
-        screen.fill((0, 0, 0))
-        screen.blit(scaled_surface, (0, 0))
-        pygame.display.flip()
+                    heading = f'Tab: {shop_filters[shop_filter] or "all"} | /: search'
+                heading = text_sprite(heading, 16, (100, 80, 60))
+                backend.sprite(heading, (SHOP_RECT.right - 28 - heading.get_width(), SHOP_RECT.y + 16))
+
+                shop.draw(backend, player.coziness, sim.owned)
+
+                # scroll indicator
+                if len(shop.items) > shop.visible:
+                    rows = shop.visible_range()
+                    scroll_txt = text_sprite(f"Scroll: {rows.start + 1}-{rows.stop}/{len(shop.items)}",
+                                             16, (100, 80, 60))
+                    backend.sprite(scroll_txt, (SHOP_RECT.x + 20, SHOP_RECT.bottom - 28))
+
+            # instructions
+            lines = [
+                'Move: Arrow keys / WASD | Space: Sit/Stand | E: Interact (windchime/book) | T: Treat | R: Rewind',
+                'Sit near fire for cozy gain, collect tea, go on rug for boost',
+                f'High cozy: {int(player.coziness)}/{HIGH_COZY_THRESHOLD} | Books read: {player.books_read} | Teas collected: {player.teas_collected}',
+                'Click fruits on trees for coziness | Click "Shop" to buy upgrades'
+            ]
+            for i, l in enumerate(lines):
+                backend.sprite(text_sprite(l, 20, (70, 50, 40)), (20, HEIGHT - 24 * (len(lines) - i)))
+
+            # debug overlay (F3)
+            if show_debug:
+                mode = 'forced' if governor.forced is not None else 'auto'
+                debug_txt = instructions_font.render(
+                    f"Detail {governor.level} ({DETAIL['name']}, {mode}) | "
+                    f"{clock.get_rawtime()} ms work | {clock.get_fps():.0f} fps | "
+                    f"chunks built {chunks.builds}"
+                    + (f" | rewind {history.seconds():.0f} s, "
+                       f"{history.bytes_per_second() / 1024:.0f} KB/s" if history else ''),
+                    True, (40, 30, 20), (245, 230, 200))
+                backend.layer().blit(debug_txt, (20, 56))
+
+            if exporting:
+                exporter.submit(backend.read_frame(export_surface))
+                frame += 1
+                if frame >= args.frames:
+                    running = False
+                continue
+
+            # scaled to fit the current window
+            backend.present(DETAIL['smooth_scale'])
+    finally:
+        # flush the last telemetry batch and the 'end' record even if the loop raised
+        try:
+            if exporter is not None:
+                failed = exporter.close()
+        finally:
+            if telemetry is not None:
+                telemetry.close()
+
+    status = 0
+    if telemetry is not None and telemetry.dropped:
+        print(f'telemetry: {telemetry.dropped} events dropped')
+    if exporting:
+        print(f'exported {exporter.frames} frames to {args.export_frames}')
+        if history is not None:
+            print(f'rewind history: {history.seconds():.1f} s in {history.bytes / 1024:.0f} KB '
+                  f'({history.bytes_per_second() / 1024:.1f} KB per second)')
+        if args.reference_dir:
+            print(f'{failed} of {len(exporter.diffs)} frames differ from {args.reference_dir}')
+            status = 1 if failed else 0
+    pygame.quit()
+    sys.exit(status)
+
+
+def _client_entity(entities, eid, fields):
+    """Create or update the drawable object for a received entity."""
+    obj = entities.get(eid)
+    kind = eid[0]
+    if obj is None:
+        if kind == 'p':
+            obj = Player(fields['x'], fields['y'])
+        elif kind == 't':
+            obj = Tea()
+        elif kind == 'f':
+            obj = Fruit(fields['x'], fields['y'])
+        else:
+            obj = Cat(fields['x'], fields['y'])
+        entities[eid] = obj
+    obj.x = fields['x']
+    obj.y = fields['y']
+    if kind == 'p':
+        obj.sitting = bool(fields['s'])
+        obj.walking = bool(fields['m'])
+        obj.walk_phase = fields['w']
+    elif kind == 'f':
+        obj.r = fields['r']
+        obj.fruit_type = fields['k']
+        obj.color = Fruit.COLORS[fields['k']]
+        obj.collected = bool(fields['c'])
+    return obj
+
+
+def run_client(host, port, room='lobby', render_backend='surface'):
+    """Thin client: send inputs to a room server and render the state it broadcasts."""
+    from cozy_net import SnapshotHistory, apply_delta, decode, encode
+
+    pygame.init()
+    backend = open_backend(render_backend, (WIDTH, HEIGHT), f'Cozy Corner - {room}')
+    clock = pygame.time.Clock()
+
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(encode({'t': 'join', 'room': room}))
+    recv_buf = b''
+    history = SnapshotHistory()
+    state = {}
+    ack = 0
+    my_id = None
+    entities = {}
+    windchime = WindChime(WINDCHIME_POS[0], WINDCHIME_POS[1])
+    light_map = LightMap((WIDTH, HEIGHT))
+    last_input = None
+    time = 0.0
+
+    running = True
+    while running:
+        dt = clock.tick(60) / 1000.0
+        time += dt
+        outgoing = []
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                outgoing.append({'t': 'sit'})
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_e:
+                outgoing.append({'t': 'use'})
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                # window may be resized; map back to game coordinates
+                mx, my = backend.to_game(event.pos)
+                outgoing.append({'t': 'click', 'x': mx, 'y': my})
+
+        # drain whatever the server has sent since last frame
+        got_snapshot = False
+        while select.select([sock], [], [], 0)[0]:
+            chunk = sock.recv(65536)
+            if not chunk:
+                running = False
+                break
+            recv_buf += chunk
+        *lines, recv_buf = recv_buf.split(b'\n')
+        for line in lines:
+            msg = decode(line)
+            if msg['t'] == 'welcome':
+                my_id = msg['id']
+            elif msg['t'] == 's':
+                base = history.get(msg['b']) if msg['b'] else {}
+                if base is None:
+                    # lost our base; ask for a full snapshot
+                    ack = 0
+                    continue
+                state = apply_delta(base, msg['u'], msg['r'])
+                history.add(msg['n'], state)
+                ack = msg['n']
+                got_snapshot = True
 
+        keys = pygame.key.get_pressed()
+        dx = (keys[pygame.K_RIGHT] or keys[pygame.K_d]) - (keys[pygame.K_LEFT] or keys[pygame.K_a])
+        dy = (keys[pygame.K_DOWN] or keys[pygame.K_s]) - (keys[pygame.K_UP] or keys[pygame.K_w])
+        if got_snapshot or (dx, dy) != last_input:
+            outgoing.append({'t': 'in', 'dx': dx, 'dy': dy, 'ack': ack})
+            last_input = (dx, dy)
+        if outgoing:
+            sock.sendall(b''.join(encode(m) for m in outgoing))
+
+        # draw
+        for eid in [eid for eid in entities if eid not in state]:
+            del entities[eid]
+        for eid, fields in state.items():
+            _client_entity(entities, eid, fields)
+
+        backend.begin()
+        layer = backend.layer()
+        draw_room(layer, time, TREES, RUG_RECT, windchime)
+        for eid, obj in entities.items():
+            if eid[0] == 't':
+                obj.draw(layer)
+        for eid, obj in entities.items():
+            if eid[0] == 'f':
+                obj.draw(layer)
+        for eid, obj in entities.items():
+            if eid[0] == 'c':
+                obj._tail_time += dt
+                obj.draw(layer)
+        for eid, obj in entities.items():
+            if eid[0] == 'p':
+                obj.draw(layer)
+        now = datetime.datetime.now()
+        light_room(light_map, time, now, RUG_RECT)
+        light_map.apply(backend)
+        coziness = state.get(my_id, {}).get('z', 0)
+        draw_ui(backend, coziness)
+        draw_clock(backend, now)
+        draw_quote(backend)
+        backend.sprite(text_sprite(f'Room: {room} | Players: {sum(1 for e in state if e[0] == "p")}',
+                                   20, (70, 50, 40)), (20, HEIGHT - 24))
+        backend.present(smooth=False)
+
+    sock.close()
     pygame.quit()
     sys.exit()
 
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Cozy Corner')
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help='join a shared room on a cozy_server.py instance')
+    parser.add_argument('--room', default='lobby',
+                        help='room name to join with --connect')
+    parser.add_argument('--weather', choices=['none', 'snow', 'rain'], default='snow',
+                        help='ambient weather over the trees')
+    parser.add_argument('--weather-count', type=int, default=None,
+                        help='number of weather particles (default: from WEATHER_DENSITY)')
+    parser.add_argument('--telemetry', metavar='DIR',
+                        help='record session telemetry to DIR '
+                             '(convert with: python cozy_telemetry.py DIR)')
+    parser.add_argument('--detail', type=int, choices=range(len(DETAIL_LEVELS)),
+                        help='force a detail level (0 = full) instead of adapting '
+                             'to frame times; F3 shows the current level')
+    parser.add_argument('--render-backend', choices=BACKENDS, default='surface',
+                        help='draw with pygame Surfaces on the CPU, or through an SDL '
+                             'Renderer with textures (benchmark: python cozy_render.py)')
+    parser.add_argument('--rewind-seconds', type=float, default=REWIND_SECONDS, metavar='S',
+                        help='seconds of history kept for rewinding with R (0 turns it off)')
+    parser.add_argument('--frame-budget', type=float, default=FRAME_BUDGET_MS, metavar='MS',
+                        help='frame time the detail governor aims to stay under')
+    export = parser.add_argument_group('headless frame export')
+    export.add_argument('--export-frames', metavar='DIR',
+                        help='render offscreen at a fixed dt and write PNG frames to DIR')
+    export.add_argument('--frames', type=int, default=600,
+                        help='number of frames to export')
+    export.add_argument('--fps', type=float, default=60.0,
+                        help='simulated frame rate (dt = 1/fps)')
+    export.add_argument('--seed', type=int, default=0,
+                        help='random seed for a reproducible session')
+    export.add_argument('--script', metavar='FILE',
+                        help='scripted inputs, see cozy_export.py')
+    export.add_argument('--reference-dir', metavar='DIR',
+                        help='compare each frame with DIR/frame_NNNNN.png; '
+                             'exit 1 if any frame differs visibly')
+    export.add_argument('--export-workers', type=int, default=None,
+                        help='PNG encoder processes (default: all cores)')
+    return parser.parse_args(argv)
+
+
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        run_client(host or '127.0.0.1', int(port), args.room, args.render_backend)
+    else:
+        main(args)
@@ -0,0 +1,147 @@
+"""Load generator for cozy_server.py: many simulated clients on localhost.
+
+Each simulated client joins a room, decodes every delta snapshot against
+its own history, acknowledges it and wanders about with random inputs.
+After a warm-up the generator measures for a while and reports server CPU
+per room and client (as rooms/clients per core), bandwidth per client and
+tick jitter.
+
+Usage:
+    python cozy_loadgen.py --rooms 50 --clients-per-room 4 --seconds 10
+    python cozy_loadgen.py --no-spawn --port 8765   # against a running server
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+
+from cozy_net import SnapshotHistory, apply_delta, decode, encode
+
+
+class SimClient:
+    def __init__(self, room):
+        self.room = room
+        self.bytes_received = 0
+        self.snapshots = 0
+
+    async def run(self, host, port, stop):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode({'t': 'join', 'room': self.room}))
+        history = SnapshotHistory()
+        loop = asyncio.get_running_loop()
+        dx = dy = 0
+        next_turn = loop.time()
+        try:
+            while not stop.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                self.bytes_received += len(line)
+                msg = decode(line)
+                if msg['t'] != 's':
+                    continue
+                base = history.get(msg['b']) if msg['b'] else {}
+                if base is None:
+                    writer.write(encode({'t': 'in', 'dx': dx, 'dy': dy, 'ack': 0}))
+                    continue
+                history.add(msg['n'], apply_delta(base, msg['u'], msg['r']))
+                self.snapshots += 1
+                if loop.time() >= next_turn:
+                    dx, dy = random.randint(-1, 1), random.randint(-1, 1)
+                    next_turn = loop.time() + random.uniform(0.5, 2.0)
+                    if random.random() < 0.1:
+                        writer.write(encode({'t': 'sit'}))
+                writer.write(encode({'t': 'in', 'dx': dx, 'dy': dy, 'ack': msg['n']}))
+        finally:
+            writer.close()
+
+
+async def query_stats(host, port, reset=False):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({'t': 'stats', 'reset': reset}))
+    stats = decode(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def wait_for_server(host, port, timeout=10.0):
+    loop = asyncio.get_running_loop()
+    give_up = loop.time() + timeout
+    while True:
+        try:
+            return await query_stats(host, port)
+        except OSError:
+            if loop.time() > give_up:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run_load(args):
+    await wait_for_server(args.host, args.port)
+    stop = asyncio.Event()
+    clients = [SimClient(f'room{r}') for r in range(args.rooms)
+               for _ in range(args.clients_per_room)]
+    tasks = [asyncio.create_task(c.run(args.host, args.port, stop)) for c in clients]
+
+    await asyncio.sleep(args.warmup)
+    await query_stats(args.host, args.port, reset=True)
+    start_bytes = [c.bytes_received for c in clients]
+    await asyncio.sleep(args.seconds)
+    stats = await query_stats(args.host, args.port)
+    received = [c.bytes_received - b for c, b in zip(clients, start_bytes)]
+
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats, received
+
+
+def report(stats, received, seconds):
+    cpu_frac = stats['cpu_s'] / stats['wall_s'] if stats['wall_s'] else 0.0
+    per_core = 1.0 / cpu_frac if cpu_frac else float('inf')
+    per_client = sum(received) / len(received) / seconds if received else 0.0
+    print(f"rooms: {stats['rooms']}  clients: {stats['clients']}  "
+          f"ticks: {stats['ticks']} in {stats['wall_s']:.1f}s")
+    print(f'server cpu: {cpu_frac * 100:.1f}% of one core')
+    print(f"capacity: ~{stats['rooms'] * per_core:.0f} rooms/core, "
+          f"~{stats['clients'] * per_core:.0f} clients/core")
+    print(f'bandwidth: {per_client / 1024:.2f} KiB/s per client '
+          f'({per_client * 8 / 1000:.1f} kbit/s)')
+    print(f"tick jitter: mean {stats['jitter_mean_ms']:.2f} ms, "
+          f"p99 {stats['jitter_p99_ms']:.2f} ms, max {stats['jitter_max_ms']:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cozy Corner room server load generator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--clients-per-room', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--tick-rate', type=int, default=30)
+    parser.add_argument('--no-spawn', action='store_true',
+                        help='use an already running server instead of starting one')
+    args = parser.parse_args(argv)
+
+    server = None
+    if not args.no_spawn:
+        server_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cozy_server.py')
+        server = subprocess.Popen(
+            [sys.executable, server_py, '--host', args.host, '--port', str(args.port),
+             '--tick-rate', str(args.tick_rate)],
+            stdout=subprocess.DEVNULL)
+    try:
+        stats, received = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    report(stats, received, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
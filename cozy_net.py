@@ -0,0 +1,75 @@
+"""Wire protocol shared by the cozy room server, thin clients and the load generator.
+
+Messages are newline-delimited JSON objects with a short type tag 't':
+
+    client -> server
+        {'t': 'join', 'room': name}
+        {'t': 'in', 'dx': -1..1, 'dy': -1..1, 'ack': tick}
+        {'t': 'sit'}
+        {'t': 'click', 'x': x, 'y': y}
+        {'t': 'stats', 'reset': bool}
+
+    server -> client
+        {'t': 'welcome', 'id': player_id, 'room': name, 'rate': ticks_per_sec}
+        {'t': 's', 'n': tick, 'b': base_tick, 'u': {id: {field: value}}, 'r': [id]}
+        {'t': 'stats', ...}
+
+A snapshot maps entity ids to flat field dicts. Each 's' message only
+carries the fields that changed between the client's last acknowledged
+snapshot (base tick 'b', 0 meaning "from nothing") and tick 'n', plus the
+ids of entities that disappeared.
+"""
+import collections
+import json
+
+HISTORY_TICKS = 64  # snapshots kept for delta bases (~2 s at 30 Hz)
+
+
+def encode(msg):
+    return json.dumps(msg, separators=(',', ':')).encode() + b'\n'
+
+
+def decode(line):
+    return json.loads(line)
+
+
+def diff_snapshot(base, current):
+    """Return (changed, removed): per-entity changed fields and vanished ids."""
+    changed = {}
+    for eid, fields in current.items():
+        old = base.get(eid)
+        if old is None:
+            changed[eid] = fields
+        elif old is not fields and old != fields:
+            changed[eid] = {k: v for k, v in fields.items() if old.get(k) != v}
+    removed = [eid for eid in base if eid not in current]
+    return changed, removed
+
+
+def apply_delta(base, changed, removed):
+    """Return a new snapshot: base with changed fields merged and removed ids dropped."""
+    state = dict(base)
+    for eid in removed:
+        state.pop(eid, None)
+    for eid, fields in changed.items():
+        old = state.get(eid)
+        state[eid] = {**old, **fields} if old is not None else fields
+    return state
+
+
+class SnapshotHistory:
+    """The last few snapshots keyed by tick, used as delta bases."""
+
+    def __init__(self, size=HISTORY_TICKS):
+        self._snaps = {}
+        self._order = collections.deque()
+        self.size = size
+
+    def add(self, tick, snap):
+        self._snaps[tick] = snap
+        self._order.append(tick)
+        while len(self._order) > self.size:
+            self._snaps.pop(self._order.popleft(), None)
+
+    def get(self, tick):
+        return self._snaps.get(tick)
@@ -0,0 +1,267 @@
+"""Render backends: where a frame is drawn and how it reaches the window.
+
+The game draws each frame through a small interface:
+
+    begin()            start a frame
+    sprite(img, pos)   a baked image that is reused between frames (scenery
+                       chunks, glows, UI plaques, text, shop rows); always pass
+                       the same Surface object for the same image
+    layer()            a Surface for everything drawn fresh each frame with
+                       pygame.draw and one-off blits
+    modulate(img)      multiply the frame so far by a full-frame image (lighting)
+    fill(rect, rgba)   a translucent rectangle
+    present(smooth)    show the frame, scaled to the window (smoothly or not)
+    read_frame(surf)   copy the finished frame into surf
+
+SurfaceBackend is the original path: everything lands in one Surface on the
+CPU, which is transform.scale'd onto the display. RendererBackend goes
+through pygame._sdl2.video: each sprite is uploaded once as a Texture,
+layer() is a transparent canvas uploaded when the frame moves on from it,
+and scaling, alpha blending and the lighting multiply are done by the SDL
+renderer (on the GPU, or SDL's software renderer where there is none).
+Every switch from layer() to another call costs the renderer one canvas
+upload, so draw code keeps its layer() work together. Its scaling filter
+is fixed when the renderer is created, so it lists smooth_scale in
+ignored_detail and the game's detail governor doesn't step down for it.
+
+Compare the two on identical scenes:
+    python cozy_render.py --frames 300 --window 1280x960
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+import weakref
+
+import pygame
+from pygame._sdl2 import video
+
+BACKENDS = ('surface', 'renderer')
+BLENDMODE_BLEND = 1  # SDL_BLENDMODE_BLEND
+BLENDMODE_MOD = 4  # SDL_BLENDMODE_MOD: dst = src * dst
+
+
+class SurfaceBackend:
+    """Draw into target on the CPU; present() scales it onto window (the display surface)."""
+
+    name = 'surface'
+    ignored_detail = ()  # detail settings (cozy_game.DETAIL_LEVELS keys) with no effect here
+
+    def __init__(self, size, target=None, window=None):
+        self.size = size
+        self.target = target if target is not None else pygame.Surface(size)
+        self.window = window
+        self._fills = {}
+
+    def begin(self):
+        pass  # every frame starts by covering the whole target with scenery
+
+    def layer(self):
+        return self.target
+
+    def sprite(self, image, pos):
+        self.target.blit(image, pos)
+
+    def modulate(self, image):
+        self.target.blit(image, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+
+    def fill(self, rect, rgba):
+        rect = pygame.Rect(rect)
+        key = (rect.size, tuple(rgba))
+        overlay = self._fills.get(key)
+        if overlay is None:
+            overlay = self._fills[key] = pygame.Surface(rect.size, pygame.SRCALPHA)
+            overlay.fill(rgba)
+        self.target.blit(overlay, rect)
+
+    def to_game(self, pos):
+        """Map a window position (e.g. a click) to game coordinates."""
+        if self.window is None:
+            return pos
+        (ww, wh), (gw, gh) = self.window.get_size(), self.size
+        return pos[0] * gw // ww, pos[1] * gh // wh
+
+    def present(self, smooth=True):
+        if self.window is None:
+            return
+        if self.window.get_size() == self.size:
+            self.window.blit(self.target, (0, 0))
+        else:
+            scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+            self.window.blit(scale(self.target, self.window.get_size()), (0, 0))
+        pygame.display.flip()
+
+    def read_frame(self, surf):
+        if surf is not self.target:
+            surf.blit(self.target, (0, 0))
+        return surf
+
+
+class RendererBackend:
+    """Draw through an SDL Renderer into its own window, scaled by SDL to any window size."""
+
+    name = 'renderer'
+    ignored_detail = ('smooth_scale',)  # SDL_RENDER_SCALE_QUALITY applies to new textures only
+
+    def __init__(self, size, title='Cozy Corner', window_size=None):
+        # linear filtering when the window is scaled; must be set before textures exist
+        os.environ.setdefault('SDL_RENDER_SCALE_QUALITY', 'linear')
+        self.size = size
+        self.window = video.Window(title, window_size or size, resizable=True)
+        self.renderer = video.Renderer(self.window)
+        self.renderer.logical_size = size
+        self._canvas = pygame.Surface(size, pygame.SRCALPHA)
+        self._canvas_tex = video.Texture(self.renderer, size, streaming=True)
+        self._canvas_tex.blend_mode = BLENDMODE_BLEND
+        self._mod_tex = video.Texture(self.renderer, size, streaming=True)
+        self._mod_tex.blend_mode = BLENDMODE_MOD
+        # textures live as long as the Surface they were uploaded from
+        self._textures = weakref.WeakKeyDictionary()
+        self._dirty = False
+        self.uploads = 0
+
+    def begin(self):
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+
+    def layer(self):
+        self._dirty = True
+        return self._canvas
+
+    def _flush(self):
+        if self._dirty:
+            self._canvas_tex.update(self._canvas)
+            self._canvas_tex.draw()
+            self._canvas.fill((0, 0, 0, 0))
+            self._dirty = False
+            self.uploads += 1
+
+    def sprite(self, image, pos):
+        self._flush()
+        tex = self._textures.get(image)
+        if tex is None:
+            tex = self._textures[image] = video.Texture.from_surface(self.renderer, image)
+            self.uploads += 1
+        tex.draw(dstrect=(pos[0], pos[1], tex.width, tex.height))
+
+    def modulate(self, image):
+        self._flush()
+        self._mod_tex.update(image)
+        self._mod_tex.draw()
+        self.uploads += 1
+
+    def fill(self, rect, rgba):
+        self._flush()
+        self.renderer.draw_blend_mode = BLENDMODE_BLEND
+        self.renderer.draw_color = rgba
+        self.renderer.fill_rect(pygame.Rect(rect))
+
+    def to_game(self, pos):
+        return pos  # the renderer's logical size already maps input to game coordinates
+
+    def present(self, smooth=True):
+        # smooth is ignored: every texture already uses the filter chosen in __init__
+        self._flush()
+        self.renderer.present()
+
+    def read_frame(self, surf):
+        self._flush()
+        return self.renderer.to_surface(surf)
+
+
+def open_backend(kind, size, title='Cozy Corner', target=None):
+    """Open a window and return the backend for it; target is the surface backend's canvas."""
+    if kind == 'renderer':
+        return RendererBackend(size, title)
+    window = pygame.display.set_mode(size, pygame.RESIZABLE)
+    pygame.display.set_caption(title)
+    return SurfaceBackend(size, target, window)
+
+
+def _benchmark_scene(seed=0):
+    """The cozy corner drawn the way the game draws it, shop open; returns draw(backend, t)."""
+    import cozy_game as game
+    import cozy_shop
+    from cozy_world import ChunkCache
+    random.seed(seed)
+
+    def render_chunk(chunk, rect):
+        chunk.fill(game.BG_COLOR)
+        game.draw_scenery(chunk, rect.topleft, game.TREES, rug_rect=game.RUG_RECT)
+
+    chunks = ChunkCache(render_chunk)
+    view = pygame.Rect(0, 0, game.WIDTH, game.HEIGHT)
+    windchime = game.WindChime(*game.WINDCHIME_POS)
+    things = ([game.Tea() for _ in range(5)]
+              + [game.Fruit(*tree) for tree in game.TREES for _ in range(3)]
+              + [game.Cat(random.randint(100, 700), random.randint(200, 500)) for _ in range(4)]
+              + [game.Player(400, 300)])
+    lamps = [(game.RUG_RECT.left - 30, game.RUG_RECT.top + 10)]
+    light_map = game.LightMap(view.size)
+    now = datetime.datetime(2024, 12, 21, 19, 30)
+    catalog = cozy_shop.Catalog.load(tunables=game.SHOP_TUNABLES)
+    shop = cozy_shop.ShopList(game.SHOP_LIST_RECT, game.ui_font(18), catalog.items)
+
+    def draw(backend, t):
+        backend.begin()
+        chunks.draw(backend, view)
+        layer = backend.layer()
+        game.draw_fire(layer, *game.FIRE_POS, t)
+        windchime.draw(layer)
+        for x, y in lamps:
+            game.draw_lamp(layer, x, y)
+        for thing in things:
+            thing.draw(layer)
+        game.light_room(light_map, t, now, game.RUG_RECT, lamps)
+        light_map.apply(backend)
+        game.draw_ui(backend, 42.0)
+        game.draw_clock(backend, now)
+        game.draw_quote(backend)
+        backend.fill(view, (20, 20, 20, 120))
+        backend.sprite(game.shop_panel_sprite(), game.SHOP_RECT.topleft)
+        shop.draw(backend, 42.0, ())
+    return draw
+
+
+def benchmark(kinds, frames=300, window_size=None):
+    """Time the same scene through each backend; returns (kind, ms per frame)."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    results = []
+    for kind in kinds:
+        draw = _benchmark_scene()
+        size = (800, 600)
+        if kind == 'renderer':
+            backend = RendererBackend(size, window_size=window_size)
+        else:
+            backend = SurfaceBackend(size, window=pygame.display.set_mode(window_size or size))
+        draw(backend, 0.0)  # build chunks and upload sprites before timing
+        backend.present()
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            draw(backend, frame / 60)
+            backend.present()
+        results.append((kind, (time.perf_counter() - t0) / frames * 1000))
+        if kind == 'renderer':
+            backend.window.destroy()
+        else:
+            pygame.display.quit()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the render backends side by side')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--window', default=None, metavar='WxH',
+                        help='window size (default: the game size, so no scaling)')
+    args = parser.parse_args(argv)
+    window_size = tuple(map(int, args.window.split('x'))) if args.window else None
+    print(f'{"backend":>10} {"ms/frame":>10}')
+    for kind, ms in benchmark(args.backends, args.frames, window_size):
+        print(f'{kind:>10} {ms:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
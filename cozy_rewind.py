@@ -0,0 +1,123 @@
+"""Rewind history: the last N seconds of game state, stored as keyframes plus deltas.
+
+States are snapshots in the cozy_net shape, {entity_id: {field: value}}
+with plain values. Every KEYFRAME_INTERVAL ticks the whole state is kept,
+compressed; in between only the fields that changed since the previous
+tick are kept (cozy_net.diff_snapshot), marshalled. Most of the scene,
+like hundreds of fruits hanging still, costs nothing between keyframes.
+
+A tick is one recorded state, so one per frame in the game. Each is
+recorded with its game time, and the window is measured in that time,
+so history covers the same seconds whatever the frame rate.
+
+Seeking decodes the nearest keyframe at or before the wanted tick and
+replays at most KEYFRAME_INTERVAL - 1 deltas onto it, whatever the length
+of history. Old history is dropped a whole keyframe group at a time.
+"""
+import bisect
+import collections
+import marshal
+import zlib
+
+from cozy_net import diff_snapshot
+
+REWIND_SECONDS = 30
+KEYFRAME_INTERVAL = 120  # ticks between full snapshots (2 s at 60 Hz)
+
+
+class RewindBuffer:
+    """History of one state per tick, the newest `seconds` of game time."""
+
+    def __init__(self, seconds=REWIND_SECONDS, keyframe_interval=KEYFRAME_INTERVAL):
+        self.window = seconds
+        self.keyframe_interval = keyframe_interval
+        # [first tick, keyframe blob, [delta blobs], [game time of each tick]]
+        self._groups = collections.deque()
+        self._last = None  # newest state, the base for the next delta
+        self.tick = -1  # newest recorded tick
+        self.bytes = 0
+
+    @property
+    def oldest(self):
+        """First tick inside the window (the group holding it may start earlier)."""
+        if not self._groups:
+            return None
+        first, _, _, times = self._groups[0]
+        return first + bisect.bisect_left(times, self._groups[-1][3][-1] - self.window)
+
+    def record(self, state, time):
+        """Append the state for the next tick, taken at game time `time` (seconds).
+
+        The buffer keeps `state`; don't mutate it.
+        """
+        tick = self.tick + 1
+        if self._last is None or tick - self._groups[-1][0] >= self.keyframe_interval:
+            blob = zlib.compress(marshal.dumps(state), 1)
+            self._groups.append([tick, blob, [], [time]])
+        else:
+            blob = marshal.dumps(diff_snapshot(self._last, state))
+            self._groups[-1][2].append(blob)
+            self._groups[-1][3].append(time)
+        self.bytes += len(blob)
+        self._last = state
+        self.tick = tick
+        # drop the oldest group once the rest still covers the whole window
+        while len(self._groups) > 1 and time - self._groups[1][3][0] >= self.window:
+            self.bytes -= _group_bytes(self._groups.popleft())
+
+    def state_at(self, tick):
+        """Decode the state recorded at tick (a fresh copy the caller may keep)."""
+        if not self._groups or not self.oldest <= tick <= self.tick:
+            raise IndexError(f'tick {tick} is not in the rewind history')
+        for first, keyframe, deltas, _ in reversed(self._groups):
+            if first <= tick:
+                break
+        state = marshal.loads(zlib.decompress(keyframe))
+        for blob in deltas[:tick - first]:
+            changed, removed = marshal.loads(blob)
+            for eid in removed:
+                state.pop(eid, None)
+            for eid, fields in changed.items():
+                if eid in state:
+                    state[eid].update(fields)
+                else:
+                    state[eid] = fields
+        return state
+
+    def truncate(self, tick):
+        """Forget everything after tick, so recording carries on from there."""
+        state = self.state_at(tick)
+        while self._groups[-1][0] > tick:
+            self.bytes -= _group_bytes(self._groups.pop())
+        first, _, deltas, times = self._groups[-1]
+        keep = tick - first
+        self.bytes -= sum(map(len, deltas[keep:]))
+        del deltas[keep:]
+        del times[keep + 1:]
+        self._last = state
+        self.tick = tick
+
+    def seconds(self):
+        """Game time that can be rewound, in seconds."""
+        if not self._groups:
+            return 0.0
+        return self._groups[-1][3][-1] - self._time_at(self.oldest)
+
+    def bytes_per_second(self):
+        """Bytes held per second of game time.
+
+        Counts the part of the oldest group that is already outside the window.
+        """
+        if not self._groups:
+            return 0.0
+        held = self._groups[-1][3][-1] - self._groups[0][3][0]
+        return self.bytes / held if held else 0.0
+
+    def _time_at(self, tick):
+        for first, _, _, times in reversed(self._groups):
+            if first <= tick:
+                return times[tick - first]
+
+
+def _group_bytes(group):
+    return len(group[1]) + sum(map(len, group[2]))
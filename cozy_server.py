@@ -0,0 +1,181 @@
+"""Asyncio room server: many shared cozy rooms per process at a fixed tick.
+
+Each room is a headless CozyRoom. Every tick the server steps all rooms,
+takes a snapshot of each, and sends every client only the entity fields
+that changed since the snapshot that client last acknowledged.
+
+Usage:
+    python cozy_server.py --port 8765 --tick-rate 30
+    python cozy_game.py --connect 127.0.0.1:8765 --room lobby
+"""
+import argparse
+import asyncio
+import collections
+import socket
+import statistics
+import time
+
+from cozy_game import CozyRoom
+from cozy_net import SnapshotHistory, decode, diff_snapshot, encode
+
+MAX_WRITE_BUFFER = 256 * 1024  # skip a tick for clients with this much unsent
+JITTER_SAMPLES = 4096
+
+
+class Client:
+    __slots__ = ('writer', 'room', 'pid', 'ack', 'bytes_sent')
+
+    def __init__(self, writer, room, pid):
+        self.writer = writer
+        self.room = room
+        self.pid = pid
+        self.ack = 0
+        self.bytes_sent = 0
+
+
+class Room:
+    def __init__(self, name):
+        self.name = name
+        self.sim = CozyRoom()
+        self.history = SnapshotHistory()
+        self.clients = []
+
+
+class RoomServer:
+    def __init__(self, tick_rate=30):
+        self.tick_rate = tick_rate
+        self.tick = 0
+        self.rooms = {}
+        self.jitter = collections.deque(maxlen=JITTER_SAMPLES)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.jitter.clear()
+        self._stats_cpu = time.process_time()
+        self._stats_wall = time.perf_counter()
+        self._stats_ticks = self.tick
+        self._stats_bytes = 0
+
+    def stats(self):
+        jitter_ms = sorted(j * 1000 for j in self.jitter) or [0.0]
+        clients = sum(len(r.clients) for r in self.rooms.values())
+        return {
+            't': 'stats',
+            'rooms': len(self.rooms),
+            'clients': clients,
+            'ticks': self.tick - self._stats_ticks,
+            'cpu_s': time.process_time() - self._stats_cpu,
+            'wall_s': time.perf_counter() - self._stats_wall,
+            'bytes_sent': self._stats_bytes,
+            'jitter_mean_ms': statistics.fmean(jitter_ms),
+            'jitter_p99_ms': jitter_ms[min(len(jitter_ms) - 1, int(len(jitter_ms) * 0.99))],
+            'jitter_max_ms': jitter_ms[-1],
+        }
+
+    async def handle_client(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg = decode(line)
+                if not isinstance(msg, dict):
+                    continue
+                kind = msg.get('t')
+                if kind == 'join' and client is None:
+                    name = str(msg.get('room', 'lobby'))
+                    room = self.rooms.get(name)
+                    if room is None:
+                        room = self.rooms[name] = Room(name)
+                    client = Client(writer, room, room.sim.add_player())
+                    room.clients.append(client)
+                    writer.write(encode({'t': 'welcome', 'id': client.pid,
+                                         'room': name, 'rate': self.tick_rate}))
+                elif kind == 'stats':
+                    writer.write(encode(self.stats()))
+                    if msg.get('reset'):
+                        self.reset_stats()
+                elif client is None:
+                    continue
+                elif kind == 'in':
+                    client.room.sim.set_input(client.pid, msg.get('dx', 0), msg.get('dy', 0))
+                    client.ack = int(msg.get('ack', 0))
+                elif kind == 'sit':
+                    client.room.sim.toggle_sit(client.pid)
+                elif kind == 'use':
+                    client.room.sim.interact(client.pid)
+                elif kind == 'click':
+                    client.room.sim.click(client.pid, float(msg.get('x', 0)),
+                                          float(msg.get('y', 0)))
+        except (ConnectionError, ValueError, TypeError, AttributeError, OverflowError):
+            # a client that sends garbage is disconnected; the room carries on
+            pass
+        finally:
+            if client is not None:
+                room = client.room
+                room.clients.remove(client)
+                room.sim.remove_player(client.pid)
+                if not room.clients:
+                    del self.rooms[room.name]
+            writer.close()
+
+    def step(self, dt):
+        self.tick += 1
+        for room in self.rooms.values():
+            room.sim.step(dt)
+            snap = room.sim.snapshot()
+            room.history.add(self.tick, snap)
+            for client in room.clients:
+                transport = client.writer.transport
+                if transport.is_closing() or transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                    continue
+                base = room.history.get(client.ack) if client.ack else None
+                changed, removed = diff_snapshot(base or {}, snap)
+                data = encode({'t': 's', 'n': self.tick,
+                               'b': client.ack if base is not None else 0,
+                               'u': changed, 'r': removed})
+                client.writer.write(data)
+                client.bytes_sent += len(data)
+                self._stats_bytes += len(data)
+
+    async def tick_loop(self):
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.tick_rate
+        deadline = loop.time()
+        while True:
+            deadline += period
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            late = loop.time() - deadline
+            self.jitter.append(late)
+            if late > period * 4:
+                # fell badly behind; don't try to catch up with a burst of ticks
+                deadline = loop.time()
+            self.step(period)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f'cozy room server on {host}:{port} at {self.tick_rate} Hz')
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.tick_loop())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cozy Corner room server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tick-rate', type=int, default=30)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(RoomServer(args.tick_rate).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Shop catalog loaded from data, and a virtualized list to browse it.
+
+Items live in shop_catalog.json:
+
+    {"id": "blanket", "name": "Cozy Blanket", "category": "comfort",
+     "price": 25, "desc": "+1 rug cozy",
+     "effects": [{"op": "add", "target": "RUG_COZY_GAIN", "value": 1.0}]}
+
+Effects are plain data; the game decides what each op does:
+
+    add / mul   change the tunable named by `target` by `value`
+    coziness    add `value` coziness at once
+    spawn       `what` is 'cat' or 'lamp'
+    unlock      `what` is 'treats'
+
+The catalog is indexed once at load: by id, by category (each sorted by
+price), by price, and by lower-cased name for prefix search. A search
+is two bisections and returns a lazy view of the matching run of names.
+ShopList draws only the rows in view from cached row surfaces and maps
+clicks to rows arithmetically, so opening, searching, scrolling and
+clicking cost the same for nine items or ten thousand.
+
+Benchmark against a synthetic catalog:
+    python cozy_shop.py --items 100 1000 10000
+"""
+import argparse
+import bisect
+import collections
+import collections.abc
+import json
+import os
+import random
+import sys
+import time
+
+import pygame
+
+from cozy_render import SurfaceBackend
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shop_catalog.json')
+ROW_HEIGHT = 40
+ROW_CACHE_SIZE = 64
+
+EFFECT_OPS = {
+    'add': ('target', 'value'),
+    'mul': ('target', 'value'),
+    'coziness': ('value',),
+    'spawn': ('what',),
+    'unlock': ('what',),
+}
+SPAWNABLE = ('cat', 'lamp')
+UNLOCKABLE = ('treats',)
+
+
+class ShopItem:
+    __slots__ = ('id', 'name', 'category', 'price', 'desc', 'effects')
+
+    def __init__(self, id, name, category, price, desc='', effects=()):
+        self.id = id
+        self.name = name
+        self.category = category
+        self.price = float(price)
+        self.desc = desc
+        self.effects = tuple(effects)
+
+
+class Catalog:
+    """Shop items in file order, with lookup indices built once."""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.by_id = {}
+        for item in self.items:
+            if item.id in self.by_id:
+                raise ValueError(f'duplicate shop item id {item.id!r}')
+            self.by_id[item.id] = item
+        cats = collections.defaultdict(list)
+        for item in self.items:
+            cats[item.category].append(item)
+        self.categories = list(cats)  # in order of first appearance
+        self.by_category = {c: sorted(v, key=lambda it: it.price) for c, v in cats.items()}
+        self.by_price = sorted(self.items, key=lambda it: it.price)
+        self._prices = [it.price for it in self.by_price]
+        self._names = sorted((it.name.lower(), i) for i, it in enumerate(self.items))
+        self._name_keys = [name for name, _ in self._names]
+
+    def __len__(self):
+        return len(self.items)
+
+    @classmethod
+    def load(cls, path=CATALOG_PATH, tunables=()):
+        """Read and validate a catalog file.
+
+        Effects naming a target outside `tunables` are rejected here rather
+        than when somebody buys the item.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        items = []
+        for n, entry in enumerate(data.get('items', [])):
+            try:
+                effects = [_check_effect(e, tunables) for e in entry.get('effects', ())]
+                items.append(ShopItem(entry['id'], entry['name'], entry.get('category', 'misc'),
+                                      entry['price'], entry.get('desc', ''), effects))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'{path}: item {n}: {e}') from None
+        return cls(items)
+
+    def priced_between(self, lo, hi):
+        """Items with lo <= price <= hi, cheapest first."""
+        return self.by_price[bisect.bisect_left(self._prices, lo):
+                             bisect.bisect_right(self._prices, hi)]
+
+    def search(self, prefix, limit=None):
+        """Items whose name starts with prefix (case-insensitive), by name.
+
+        Returns a read-only sequence over the index; nothing is copied, so
+        a short prefix costs the same as a long one.
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._name_keys, prefix)
+        stop = bisect.bisect_right(self._name_keys, prefix + chr(sys.maxunicode), lo=start)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return _NameRange(self, start, stop)
+
+
+class _NameRange(collections.abc.Sequence):
+    """Catalog items for positions start..stop of the sorted name index."""
+
+    __slots__ = ('_catalog', '_start', '_stop')
+
+    def __init__(self, catalog, start, stop):
+        self._catalog = catalog
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('search result index out of range')
+        return self._catalog.items[self._catalog._names[self._start + index][1]]
+
+
+def _check_effect(effect, tunables):
+    op = effect['op']
+    if op not in EFFECT_OPS:
+        raise ValueError(f'unknown effect op {op!r}')
+    for key in EFFECT_OPS[op]:
+        if key not in effect:
+            raise ValueError(f'{op} effect needs {key!r}')
+    if op in ('add', 'mul') and effect['target'] not in tunables:
+        raise ValueError(f'unknown effect target {effect["target"]!r}')
+    if op == 'spawn' and effect['what'] not in SPAWNABLE:
+        raise ValueError(f'cannot spawn {effect["what"]!r}')
+    if op == 'unlock' and effect['what'] not in UNLOCKABLE:
+        raise ValueError(f'cannot unlock {effect["what"]!r}')
+    return dict(effect)
+
+
+class ShopList:
+    """A scrolling window of ROW_HEIGHT rows over a sequence of items.
+
+    Rows are pre-rendered per (item, button state) and kept in a small LRU,
+    so a redraw is one blit per visible row.
+    """
+
+    def __init__(self, rect, font, items=()):
+        self.rect = pygame.Rect(rect)
+        self.font = font
+        self.visible = self.rect.height // ROW_HEIGHT
+        self.items = items
+        self.scroll = 0
+        self._rows = collections.OrderedDict()
+        self.renders = 0
+
+    def set_items(self, items):
+        self.items = items
+        self.scroll = 0
+
+    def scroll_by(self, rows):
+        self.scroll = max(0, min(len(self.items) - self.visible, self.scroll + rows))
+
+    def visible_range(self):
+        return range(self.scroll, min(self.scroll + self.visible, len(self.items)))
+
+    def button_rect(self, index):
+        """Screen rect of the buy button on row `index` (which must be in view)."""
+        return pygame.Rect(self.rect.x + 260, self.rect.y + (index - self.scroll) * ROW_HEIGHT,
+                           90, 26)
+
+    def item_at(self, pos):
+        """(index, item) whose buy button is under pos, or None."""
+        x, y = pos[0] - self.rect.x, pos[1] - self.rect.y
+        if not (0 <= y < self.visible * ROW_HEIGHT):
+            return None
+        index = self.scroll + y // ROW_HEIGHT
+        if index >= len(self.items) or not self.button_rect(index).collidepoint(pos):
+            return None
+        return index, self.items[index]
+
+    def _row(self, item, state):
+        key = (item.id, state)
+        row = self._rows.get(key)
+        if row is not None:
+            self._rows.move_to_end(key)
+            return row
+        row = pygame.Surface((self.rect.width, 34))
+        row.fill((220, 190, 150))  # panel colour behind the rounded corners
+        pygame.draw.rect(row, (255, 245, 230), row.get_rect(), border_radius=8)
+        row.blit(self.font.render(item.name, True, (50, 30, 20)), (6, 6))
+        row.blit(self.font.render(item.desc, True, (90, 70, 50)), (6, 22))
+        button = pygame.Rect(260, 0, 90, 26)
+        if state == 'owned':
+            pygame.draw.rect(row, (170, 170, 170), button, border_radius=6)
+            label = self.font.render('Owned', True, (100, 100, 100))
+        else:
+            color = (160, 120, 80) if state == 'buy' else (200, 180, 160)
+            pygame.draw.rect(row, color, button, border_radius=6)
+            label = self.font.render(f'Buy {int(item.price)}', True, (255, 245, 230))
+        row.blit(label, (button.x + 12, button.y + 5))
+        self.renders += 1
+        self._rows[key] = row
+        if len(self._rows) > ROW_CACHE_SIZE:
+            self._rows.popitem(last=False)
+        return row
+
+    def draw(self, backend, coziness, owned):
+        for index in self.visible_range():
+            item = self.items[index]
+            if item.id in owned:
+                state = 'owned'
+            else:
+                state = 'buy' if coziness >= item.price else 'poor'
+            backend.sprite(self._row(item, state),
+                           (self.rect.x, self.rect.y + (index - self.scroll) * ROW_HEIGHT))
+
+
+def synthetic_catalog(count, seed=0):
+    """A catalog of `count` made-up items, for benchmarks."""
+    rng = random.Random(seed)
+    words = ['Cozy', 'Warm', 'Soft', 'Maple', 'Pine', 'Snowy', 'Honey', 'Velvet']
+    things = ['Blanket', 'Mug', 'Candle', 'Scarf', 'Cushion', 'Lantern', 'Quilt', 'Teapot']
+    categories = ['comfort', 'hearth', 'tea', 'pets', 'music', 'seasonal']
+    return Catalog(ShopItem(f'item{i}', f'{rng.choice(words)} {rng.choice(things)} {i}',
+                            rng.choice(categories), rng.randint(5, 200), 'seasonal item',
+                            [{'op': 'coziness', 'value': 5}])
+                   for i in range(count))
+
+
+def benchmark(counts, frames=300):
+    """Time index build, then per-frame scroll+draw and a prefix search shown in full."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    backend = SurfaceBackend((800, 600))
+    font = pygame.font.SysFont(None, 18)
+    results = []
+    for count in counts:
+        t0 = time.perf_counter()
+        catalog = synthetic_catalog(count)
+        t_build = time.perf_counter() - t0
+        shop = ShopList((210, 164, 364, 7 * ROW_HEIGHT), font, catalog.items)
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            shop.scroll_by(1 if frame % 40 < 20 else -1)
+            shop.draw(backend, 100.0, ())
+        t_frame = (time.perf_counter() - t0) / frames
+        # as the game does while '/' is held open: every keystroke shows all matches
+        typed = ['', 'w', 'wa', 'war', 'warm', 'warm ', 'warm m']
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            shop.set_items(catalog.search(typed[frame % len(typed)]))
+        t_search = (time.perf_counter() - t0) / frames
+        results.append((count, t_build * 1000, t_frame * 1000, t_search * 1000))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the shop catalog and list')
+    parser.add_argument('--items', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args(argv)
+    print(f'{"items":>8} {"index ms":>10} {"frame ms":>10} {"search ms":>10}')
+    for count, build, frame, search in benchmark(args.items, args.frames):
+        print(f'{count:>8} {build:>10.2f} {frame:>10.3f} {search:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
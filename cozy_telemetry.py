@@ -0,0 +1,184 @@
+"""Session telemetry: fixed-size binary records, written off the main thread.
+
+The game thread packs each event into a preallocated ring buffer and
+returns immediately. A background writer thread drains the ring in
+batches and appends each batch as a gzip member to a rotating log file,
+so a crash loses at most the current batch. When the ring is full the
+event is dropped and counted; the writer records the drop count in the
+log so gaps are visible.
+
+The ring has exactly one producer (the game loop) and one consumer (the
+writer). Each side only advances its own counter, so no lock is needed.
+
+Convert logs to CSV:
+    python cozy_telemetry.py telemetry/ -o session.csv
+"""
+import argparse
+import csv
+import glob
+import gzip
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# time since session start (s), kind, value, value2, label
+LABEL_SIZE = 32
+RECORD = struct.Struct(f'<dB3xff{LABEL_SIZE}s')
+
+SESSION = 0  # label 'start' / 'end'
+COZINESS = 1  # value = coziness, sampled once per second
+PURCHASE = 2  # label = shop item id, value = price
+TEA = 3  # value = teas collected so far
+BOOK = 4  # value = books read so far
+FRUIT = 5  # label = fruit type, value = coziness gained
+SIT = 6  # value = 1 sat down, 0 stood up
+FRAME = 7  # value = mean frame work time (ms), value2 = max, over the last second
+DROPPED = 8  # value = events dropped since the previous DROPPED record
+
+KIND_NAMES = {
+    SESSION: 'session', COZINESS: 'coziness', PURCHASE: 'purchase', TEA: 'tea',
+    BOOK: 'book', FRUIT: 'fruit', SIT: 'sit', FRAME: 'frame', DROPPED: 'dropped',
+}
+
+
+class Telemetry:
+    """Ring-buffered event log flushed to DIR/telemetry-<session>-NNN.bin.gz."""
+
+    def __init__(self, directory, capacity=8192, flush_interval=1.0,
+                 max_file_bytes=1 << 20, max_files=20):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.session = time.strftime('%Y%m%d-%H%M%S')
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.dropped = 0
+        self._ring = bytearray(RECORD.size * capacity)
+        self._head = 0  # records written (advanced by the game thread only)
+        self._tail = 0  # records flushed (advanced by the writer only)
+        self._t0 = time.perf_counter()
+        self._file_index = 0
+        self._file_bytes = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._writer = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self._writer.start()
+        self.log(SESSION, label='start')
+
+    def log(self, kind, value=0.0, value2=0.0, label=''):
+        """Record an event; never blocks. Drops it if the writer has fallen behind."""
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.dropped += 1
+            return
+        RECORD.pack_into(self._ring, (head % self.capacity) * RECORD.size,
+                         time.perf_counter() - self._t0, kind, value, value2,
+                         pack_label(label))
+        self._head = head + 1
+        if head - self._tail >= self.capacity // 2:
+            self._wake.set()
+
+    def close(self):
+        self.log(SESSION, label='end')
+        self._stop = True
+        self._wake.set()
+        self._writer.join()
+
+    def _take_batch(self):
+        head, tail = self._head, self._tail
+        if head == tail:
+            return b''
+        size = RECORD.size
+        start, end = tail % self.capacity, head % self.capacity
+        if start < end:
+            batch = bytes(self._ring[start * size:end * size])
+        else:
+            batch = bytes(self._ring[start * size:]) + bytes(self._ring[:end * size])
+        self._tail = head
+        return batch
+
+    def _run(self):
+        reported_drops = 0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stopping = self._stop
+            batch = self._take_batch()
+            dropped = self.dropped
+            if dropped != reported_drops:
+                batch += RECORD.pack(time.perf_counter() - self._t0, DROPPED,
+                                     dropped - reported_drops, 0.0, b'')
+                reported_drops = dropped
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _path(self, index):
+        return os.path.join(self.directory, f'telemetry-{self.session}-{index:03d}.bin.gz')
+
+    def _write(self, batch):
+        if self._file_bytes >= self.max_file_bytes:
+            self._file_index += 1
+            self._file_bytes = 0
+            old = self._file_index - self.max_files
+            if old >= 0 and os.path.exists(self._path(old)):
+                os.remove(self._path(old))
+        with open(self._path(self._file_index), 'ab') as f:
+            f.write(gzip.compress(batch))
+        self._file_bytes += len(batch)
+
+
+def pack_label(label):
+    """UTF-8 label for a record, at most LABEL_SIZE bytes.
+
+    A label that doesn't fit keeps as many whole characters as fit beside
+    '~' and a checksum of the full label, so two long labels that share a
+    prefix still log differently.
+    """
+    raw = label.encode()
+    if len(raw) <= LABEL_SIZE:
+        return raw
+    head = raw[:LABEL_SIZE - 9].decode(errors='ignore').encode()
+    return head + b'~%08x' % zlib.crc32(raw)
+
+
+def read_records(paths):
+    """Yield (t, kind, value, value2, label) from log files in order."""
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = gzip.decompress(f.read())
+        for t, kind, value, value2, label in RECORD.iter_unpack(data):
+            yield t, kind, value, value2, label.rstrip(b'\0').decode(errors='replace')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert Cozy Corner telemetry logs to CSV')
+    parser.add_argument('paths', nargs='+', help='log files or directories of them')
+    parser.add_argument('-o', '--output', help='CSV file (default: stdout)')
+    args = parser.parse_args(argv)
+    files = []
+    for p in args.paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, 'telemetry-*.bin.gz'))))
+        else:
+            files.append(p)
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['file', 'time_s', 'event', 'value', 'value2', 'label'])
+        for path in files:
+            for t, kind, value, value2, label in read_records([path]):
+                writer.writerow([os.path.basename(path), f'{t:.3f}',
+                                 KIND_NAMES.get(kind, kind), f'{value:g}', f'{value2:g}', label])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+"""Camera, spatial index, chunked scenery cache and navigation for the world.
+
+Static scenery is rendered lazily into fixed-size chunk surfaces which are
+kept in an LRU cache, so memory and per-frame drawing depend on the size
+of the viewport rather than the size of the world.
+
+NavGrid computes shared flow fields: one Dijkstra pass per target gives
+every cell a direction to walk, so any number of walkers can follow it
+with a single lookup each.
+
+Time the cats' fields on the home grid and check the flee field reaches
+every cell near the fire:
+    python cozy_world.py
+"""
+import argparse
+import collections
+import heapq
+import math
+import os
+import sys
+import time
+
+import pygame
+
+CHUNK_SIZE = 256
+NAV_CELL = 16
+FLOW_CACHE_SIZE = 32
+
+# 8-neighbourhood: (dx, dy, step cost)
+_NEIGHBOURS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+               (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)),
+               (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2))]
+
+
+class Camera:
+    """A viewport rectangle that follows a point, clamped to the world."""
+
+    def __init__(self, view_size, world_rect):
+        self.rect = pygame.Rect((0, 0), view_size)
+        self.world_rect = pygame.Rect(world_rect)
+
+    @property
+    def offset(self):
+        return self.rect.topleft
+
+    def follow(self, x, y):
+        self.rect.center = (int(x), int(y))
+        self.rect.clamp_ip(self.world_rect)
+
+    def to_world(self, sx, sy):
+        return sx + self.rect.x, sy + self.rect.y
+
+
+class SpatialGrid:
+    """Bucket items by the grid cells their bounding rects overlap.
+
+    query() returns items in insertion order, so anything drawn from it
+    overlaps the same way in every chunk.
+    """
+
+    def __init__(self, cell_size=CHUNK_SIZE):
+        self.cell_size = cell_size
+        self._cells = collections.defaultdict(list)
+        self._count = 0
+
+    def _cell_range(self, rect):
+        cs = self.cell_size
+        return (range(rect.left // cs, (rect.right - 1) // cs + 1),
+                range(rect.top // cs, (rect.bottom - 1) // cs + 1))
+
+    def insert(self, item, rect):
+        entry = (self._count, item)
+        self._count += 1
+        xs, ys = self._cell_range(rect)
+        for cy in ys:
+            for cx in xs:
+                self._cells[(cx, cy)].append(entry)
+
+    def query(self, rect):
+        found = {}
+        xs, ys = self._cell_range(rect)
+        for cy in ys:
+            for cx in xs:
+                for order, item in self._cells.get((cx, cy), ()):
+                    found[order] = item
+        return [found[k] for k in sorted(found)]
+
+
+class ChunkCache:
+    """Pre-rendered CHUNK_SIZE squares of static scenery, built lazily, evicted LRU.
+
+    render(surf, world_rect) must draw everything static inside world_rect
+    onto surf, with world_rect.topleft at surf's (0, 0).
+    """
+
+    def __init__(self, render, chunk_size=CHUNK_SIZE, capacity=48):
+        self._render = render
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self._chunks = collections.OrderedDict()
+        self.builds = 0
+
+    def _get(self, key):
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            return chunk
+        cs = self.chunk_size
+        chunk = pygame.Surface((cs, cs))
+        self._render(chunk, pygame.Rect(key[0] * cs, key[1] * cs, cs, cs))
+        self.builds += 1
+        self._chunks[key] = chunk
+        while len(self._chunks) > self.capacity:
+            self._chunks.popitem(last=False)
+        return chunk
+
+    def draw(self, backend, view):
+        """Draw the chunks covering the view rect (world coordinates) as backend sprites."""
+        cs = self.chunk_size
+        for cy in range(view.top // cs, (view.bottom - 1) // cs + 1):
+            for cx in range(view.left // cs, (view.right - 1) // cs + 1):
+                backend.sprite(self._get((cx, cy)), (cx * cs - view.x, cy * cs - view.y))
+
+    def invalidate(self, rect=None):
+        """Forget chunks overlapping rect (world coordinates), or all of them."""
+        if rect is None:
+            self._chunks.clear()
+            return
+        cs = self.chunk_size
+        for key in [k for k in self._chunks
+                    if rect.colliderect((k[0] * cs, k[1] * cs, cs, cs))]:
+            del self._chunks[key]
+
+
+class NavGrid:
+    """Walkable cells over a world rect, with cached flow fields.
+
+    A flow field is a list holding a unit (dx, dy) per cell, (0, 0) at the
+    target or where there is nowhere better to go. Fields are cached by
+    target until obstacles change.
+    """
+
+    def __init__(self, rect, cell=NAV_CELL):
+        self.rect = pygame.Rect(rect)
+        self.cell = cell
+        self.cols = -(-self.rect.width // cell)
+        self.rows = -(-self.rect.height // cell)
+        self.blocked = bytearray(self.cols * self.rows)
+        self._fields = collections.OrderedDict()
+        self._links = None
+
+    def _cells_in(self, rect):
+        r = pygame.Rect(rect).clip(self.rect)
+        if not r.width or not r.height:
+            return []
+        c0 = (r.left - self.rect.left) // self.cell
+        c1 = (r.right - 1 - self.rect.left) // self.cell
+        r0 = (r.top - self.rect.top) // self.cell
+        r1 = (r.bottom - 1 - self.rect.top) // self.cell
+        return [row * self.cols + col for row in range(r0, r1 + 1)
+                for col in range(c0, c1 + 1)]
+
+    def block_rect(self, rect):
+        """Mark cells overlapping rect as obstacles; drops cached fields."""
+        for i in self._cells_in(rect):
+            self.blocked[i] = 1
+        self._fields.clear()
+        self._links = None
+
+    def cell_at(self, x, y):
+        col = (int(x) - self.rect.left) // self.cell
+        row = (int(y) - self.rect.top) // self.cell
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return None
+
+    def is_blocked(self, x, y):
+        i = self.cell_at(x, y)
+        return i is None or bool(self.blocked[i])
+
+    def _neighbours(self):
+        # per cell: the walkable cells one step away as (index, cost, unit direction);
+        # built once per set of obstacles so searches don't redo the bounds checks
+        if self._links is not None:
+            return self._links
+        cols, rows, blocked = self.cols, self.rows, self.blocked
+        links = []
+        for i in range(cols * rows):
+            row, col = divmod(i, cols)
+            out = []
+            for dx, dy, cost in _NEIGHBOURS:
+                nc, nr = col + dx, row + dy
+                if not (0 <= nc < cols and 0 <= nr < rows):
+                    continue
+                j = nr * cols + nc
+                # no cutting corners past obstacles on diagonals
+                if blocked[j] or (dx and dy and (blocked[row * cols + nc]
+                                                 or blocked[nr * cols + col])):
+                    continue
+                out.append((j, cost, (dx / cost, dy / cost)))
+            links.append(out)
+        self._links = links
+        return links
+
+    def _distances(self, sources):
+        # multi-source Dijkstra over walkable cells; sources may be blocked
+        links = self._neighbours()
+        dist = [math.inf] * (self.cols * self.rows)
+        heap = []
+        for i in sources:
+            dist[i] = 0.0
+            heap.append((0.0, i))
+        heapq.heapify(heap)
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            d, i = pop(heap)
+            if d > dist[i]:
+                continue
+            for j, cost, _ in links[i]:
+                nd = d + cost
+                if nd < dist[j]:
+                    dist[j] = nd
+                    push(heap, (nd, j))
+        return dist
+
+    def _flow(self, dist, better):
+        # point every walkable cell at its best neighbour according to `better`
+        links, blocked = self._neighbours(), self.blocked
+        field = [(0.0, 0.0)] * (self.cols * self.rows)
+        for i, d in enumerate(dist):
+            if blocked[i] or d == math.inf:
+                continue
+            best, best_d = None, d
+            for j, _, step in links[i]:
+                if better(dist[j], best_d):
+                    best, best_d = step, dist[j]
+            if best is not None:
+                field[i] = best
+        return field
+
+    def _cached(self, key, build):
+        field = self._fields.get(key)
+        if field is None:
+            field = self._fields[key] = build()
+            if len(self._fields) > FLOW_CACHE_SIZE:
+                self._fields.popitem(last=False)
+        else:
+            self._fields.move_to_end(key)
+        return field
+
+    def flow_to_rect(self, rect):
+        """Field leading into rect (world coordinates)."""
+        rect = pygame.Rect(rect)
+        return self._cached(('to', tuple(rect)), lambda: self._flow(
+            self._distances(self._cells_in(rect)), lambda a, b: a < b))
+
+    def flow_to_point(self, x, y):
+        """Field leading to the cell containing (x, y)."""
+        i = self.cell_at(x, y)
+        if i is None:
+            return None
+        return self._cached(('to', i), lambda: self._flow(
+            self._distances([i]), lambda a, b: a < b))
+
+    def flow_away_from_rect(self, rect, reach):
+        """Field leading away from rect until `reach` px from it.
+
+        The search starts from the cells under rect and only steps onto
+        walkable cells, so an obstacle's rect must cover all of its blocked
+        cells or the field can only leave through the gaps.
+        """
+        rect = pygame.Rect(rect)
+        # distances run from source cell centres, half a cell inside the rect
+        limit = reach / self.cell + 0.5
+
+        def build():
+            dist = self._distances(self._cells_in(rect))
+            # cells already far enough away stay put
+            capped = [min(d, limit) for d in dist]
+            return self._flow(capped, lambda a, b: a > b)
+        return self._cached(('away', tuple(rect), reach), build)
+
+    def cells_near(self, rect, reach):
+        """Walkable cells whose centre is closer than `reach` px to rect."""
+        rect = pygame.Rect(rect)
+        near = []
+        for i in self._cells_in(rect.inflate(2 * reach, 2 * reach)):
+            if self.blocked[i]:
+                continue
+            row, col = divmod(i, self.cols)
+            x = self.rect.left + col * self.cell + self.cell / 2
+            y = self.rect.top + row * self.cell + self.cell / 2
+            dx = max(rect.left - x, 0, x - rect.right)
+            dy = max(rect.top - y, 0, y - rect.bottom)
+            if math.hypot(dx, dy) < reach:
+                near.append(i)
+        return near
+
+    def direction(self, field, x, y):
+        """Unit direction to walk from (x, y) on field, or (0, 0)."""
+        i = self.cell_at(x, y)
+        if field is None or i is None:
+            return 0.0, 0.0
+        return field[i]
+
+
+def check_home_nav(repeat=20):
+    """Build the cats' fields on the home grid.
+
+    Returns (ms to build the rug and flee fields, cells within the fire's
+    reach, those of them the flee field leaves standing still).
+    """
+    import cozy_game as game
+    nav = game.build_home_nav(game.TREES)
+    nav._neighbours()  # built once per set of obstacles, not per field
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        nav._fields.clear()
+        fields = game.cat_fields(nav, game.RUG_RECT)
+    ms = (time.perf_counter() - t0) / repeat * 1000
+    near = nav.cells_near(game.FIRE_RECT, game.CAT_FIRE_REACH)
+    stuck = [i for i in near if fields['flee'][i] == (0.0, 0.0)]
+    return ms, near, stuck
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and check the cats' flow fields")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    ms, near, stuck = check_home_nav(args.repeat)
+    print(f'rug + flee fields: {ms:.2f} ms')
+    print(f'flee: {len(near) - len(stuck)} of {len(near)} cells near the fire lead away')
+    return 1 if stuck else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())